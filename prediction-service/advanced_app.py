@@ -13,10 +13,9 @@ import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Optional
 
-import yfinance as yf
 import pandas as pd
 import numpy as np
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
 import ta
 from sklearn.ensemble import RandomForestRegressor
@@ -34,7 +33,13 @@ except ImportError:
     StockPredictor = None
     HAS_TENSORFLOW = False
 
-from options_pricing import OptionsPricingEngine, STRATEGY_TEMPLATES
+from options_pricing import OptionsPricingEngine, STRATEGY_TEMPLATES, DEFAULT_VOLATILITY
+from vol_surface import VolSurface
+from monte_carlo import MonteCarloEngine
+from stress_testing import StressTestEngine
+from strategy_scanner import StrategyScanner
+from ohlcv_store import get_history, history_store
+from single_flight import upstream_flights
 import traceback
 
 # Configure logging
@@ -51,22 +56,44 @@ if HAS_TENSORFLOW:
 else:
     predictor = None
     
-options_engine = OptionsPricingEngine()
+options_engine = OptionsPricingEngine(
+    max_workers=int(os.environ.get('OPTIONS_FETCH_WORKERS', 4)),
+    expiration_timeout=float(os.environ.get('OPTIONS_FETCH_TIMEOUT', 15))
+)
+monte_carlo_engine = MonteCarloEngine(options_engine)
+stress_engine = StressTestEngine(options_engine)
+strategy_scanner = StrategyScanner(risk_free_rate=options_engine.risk_free_rate)
+MAX_SIMULATION_PATHS = 5000000
+MAX_SIMULATION_SECONDS = 10.0
+MAX_PAYOFF_POINTS = 100000
+MAX_SURFACE_SPOTS = 400
+MAX_SURFACE_DAYS = 120
+MAX_SURFACE_VOL_SHIFTS = 21
+MAX_STRESS_SCENARIOS = 20000
+
+# Response shapes accepted by /options-chain?format=
+CHAIN_WIRE_FORMATS = ('records', 'columnar', 'npz')
 
 # Cache for storing predictions and options data
 prediction_cache = {}
-options_cache = {}
+options_cache = {}  # Spot and expiration list per symbol
+expiration_cache = {}  # Processed chain per (symbol, expiration)
+vol_surface_cache = {}
 CACHE_DURATION = 3600  # 1 hour cache
+OPTIONS_INDEX_TTL = 300  # Spot / expiration list refresh
+
+# Chain TTL by days to expiration: near-dated quotes go stale fastest
+EXPIRATION_TTLS = ((7, 60), (30, 300), (180, 900))
+LONG_DATED_TTL = 3600
 
 class SimpleFallbackPredictor:
     """Simple fallback predictor when TensorFlow is not available"""
     
-    def simple_prediction(self, symbol):
-        """Generate a simple prediction without TensorFlow"""
+    def simple_prediction(self, symbol, history=get_history):
+        """Generate a simple prediction without TensorFlow; history(symbol, period) loads the bars"""
         try:
             # Fetch recent data
-            ticker = yf.Ticker(symbol)
-            data = ticker.history(period="1y")
+            data = history(symbol, "1y")
             
             if data.empty:
                 return None
@@ -161,8 +188,7 @@ class AdvancedStockPredictor:
     def fetch_data(self, symbol: str, period: str = "2y") -> pd.DataFrame:
         """Fetch stock data with comprehensive error handling"""
         try:
-            ticker = yf.Ticker(symbol)
-            df = ticker.history(period=period)
+            df = get_history(symbol, period)
             
             if df.empty:
                 raise ValueError(f"No data found for {symbol}")
@@ -432,24 +458,28 @@ def predict_stock(symbol):
                     'source': 'cache'
                 })
         
-        # Generate new prediction
-        logger.info(f"Generating advanced prediction for {symbol}")
+        # Generate new prediction; concurrent misses for a symbol share one download and model fit
         start_time = time.time()
         
-        prediction_data = predictor.train_and_predict(symbol)
+        def generate():
+            logger.info(f"Generating advanced prediction for {symbol}")
+            prediction_data = predictor.train_and_predict(symbol)
+            # Cache the result
+            prediction_cache[cache_key] = (prediction_data, current_time)
+            return prediction_data
         
-        # Cache the result
-        prediction_cache[cache_key] = (prediction_data, current_time)
+        prediction_data, coalesced = upstream_flights.do((symbol, 'prediction', '2y'), generate)
         
         end_time = time.time()
-        logger.info(f"Advanced prediction for {symbol} completed in {end_time - start_time:.2f} seconds")
+        logger.info(f"Advanced prediction for {symbol} completed in {end_time - start_time:.2f} seconds"
+                    f"{' (coalesced)' if coalesced else ''}")
         
         return jsonify({
             'success': True,
             'cached': False,
             'data': prediction_data,
             'processing_time': round(end_time - start_time, 2),
-            'source': 'fresh'
+            'source': 'coalesced' if coalesced else 'fresh'
         })
         
     except Exception as e:
@@ -479,20 +509,25 @@ def predict_simple(symbol):
                     'source': 'cache'
                 })
         
-        # Use appropriate predictor
-        if HAS_TENSORFLOW and predictor:
-            result = predictor.simple_prediction(symbol)
-        else:
-            result = fallback_predictor.simple_prediction(symbol)
+        def generate():
+            # Use appropriate predictor
+            if HAS_TENSORFLOW and predictor:
+                result = predictor.simple_prediction(symbol)
+            else:
+                result = fallback_predictor.simple_prediction(symbol)
+            if result:
+                # Cache the result
+                prediction_cache[cache_key] = (result, current_time)
+            return result
+        
+        result, coalesced = upstream_flights.do((symbol, 'simple-prediction', '1y'), generate)
         
         if result:
-            # Cache the result
-            prediction_cache[cache_key] = (result, current_time)
             return jsonify({
                 'success': True,
                 'cached': False,
                 'data': result,
-                'source': 'fresh'
+                'source': 'coalesced' if coalesced else 'fresh'
             })
         else:
             return jsonify({'success': False, 'error': 'Unable to generate simple prediction'}), 500
@@ -510,11 +545,14 @@ def predict_batch():
         if not symbols:
             return jsonify({'success': False, 'error': 'No symbols provided'}), 400
         
+        # One grouped download for the whole batch; each prediction reads from the panel
+        panel = history_store.preload(symbols, "1y")
+        
         results = {}
         for symbol in symbols:
             try:
                 symbol = symbol.upper()
-                result = predictor.simple_prediction(symbol)
+                result = fallback_predictor.simple_prediction(symbol, panel.get_history)
                 results[symbol] = result
             except Exception as e:
                 results[symbol] = {'error': str(e)}
@@ -526,44 +564,298 @@ def predict_batch():
 
 # ==================== OPTIONS ENDPOINTS ====================
 
+def expiration_ttl(time_to_exp):
+    """Seconds a processed chain stays fresh, by time to expiration in years"""
+    days = time_to_exp * 365
+    for max_days, ttl in EXPIRATION_TTLS:
+        if days <= max_days:
+            return ttl
+    return LONG_DATED_TTL
+
+def get_options_index(symbol):
+    """Return (spot and expiration list, cached flag) for a symbol; no chain is fetched"""
+    cache_key = f"options_{symbol}"
+    if cache_key in options_cache:
+        index, timestamp = options_cache[cache_key]
+        if time.time() - timestamp < OPTIONS_INDEX_TTL:
+            return index, True
+    
+    def load_index():
+        index = options_engine.get_expiration_index(symbol)
+        if index:
+            options_cache[cache_key] = (index, time.time())
+        return index
+    
+    index, _ = upstream_flights.do((symbol, 'options-index', None), load_index)
+    return index, False
+
+def get_cached_options_chain(symbol, expirations=None):
+    """
+    Return (columnar chain, cache timestamp, cached flag) for a symbol
+    Chains are cached per expiration and only loaded when first asked for;
+    expirations defaults to the nearest options_engine.max_expirations. Each
+    chain expires on its own tenor-based TTL, and an expired chain seeds an
+    incremental refresh that only reprices contracts whose quotes changed.
+    The timestamp is that of the most recently loaded chain returned.
+    """
+    index, index_cached = get_options_index(symbol)
+    if not index:
+        return None, time.time(), False
+    
+    available = index['expirationDates']
+    if expirations is None:
+        expirations = available[:options_engine.max_expirations]
+    else:
+        unknown = [exp for exp in expirations if exp not in available]
+        if unknown:
+            raise ValueError(f"Unknown expiration(s) for {symbol}: {', '.join(unknown)}")
+    
+    current_time = time.time()
+    chains, timestamps, stale, previous = {}, {}, [], {}
+    for exp_date in expirations:
+        cached = expiration_cache.get((symbol, exp_date))
+        if cached and current_time - cached[1] < expiration_ttl(cached[0]['timeToExpiration']):
+            chains[exp_date], timestamps[exp_date] = cached
+            continue
+        stale.append(exp_date)
+        if cached:
+            previous[exp_date] = cached[0]
+    
+    failed, coalesced = [], False
+    if stale:
+        def load_stale():
+            loaded, failed = options_engine.load_expirations(symbol, stale, index['currentPrice'], previous)
+            for exp_date, chain in loaded.items():
+                expiration_cache[(symbol, exp_date)] = (chain, current_time)
+            return {exp_date: (chain, current_time) for exp_date, chain in loaded.items()}, failed
+        
+        # Concurrent refreshes of the same expirations share one upstream load
+        (loaded, failed), coalesced = upstream_flights.do((symbol, 'options-chain', ','.join(stale)), load_stale)
+        for exp_date, (chain, loaded_at) in loaded.items():
+            chains[exp_date], timestamps[exp_date] = chain, loaded_at
+    
+    chains = {exp_date: chains[exp_date] for exp_date in expirations if exp_date in chains}
+    options_data = options_engine.build_options_data(index, chains, failed, refreshed=stale)
+    if stale and not coalesced:
+        logger.info(f"Options refresh for {symbol}: loaded {len(stale)} expiration(s), recomputed "
+                    f"{options_data['recomputedContracts']} of {options_data['totalContracts']} contracts")
+    
+    chain_timestamp = max(timestamps.values(), default=current_time)
+    return options_data, chain_timestamp, index_cached and not stale
+
+def get_vol_surface(symbol):
+    """Return the cached volatility surface for a symbol, rebuilding it when its chain is refreshed"""
+    options_data, chain_timestamp, _ = get_cached_options_chain(symbol)
+    if not options_data:
+        return None
+    
+    if symbol in vol_surface_cache:
+        surface, built_from, _ = vol_surface_cache[symbol]
+        if built_from == chain_timestamp:
+            return surface
+    
+    surface = VolSurface.from_chain(options_data)
+    # The surface is only as fresh as the first of its source chains to go stale
+    fresh_until = min((loaded_at + expiration_ttl(chain['timeToExpiration'])
+                       for chain, loaded_at in (expiration_cache.get((symbol, exp_date), (None, None))
+                                                for exp_date in options_data['chains'])
+                       if chain is not None), default=chain_timestamp)
+    vol_surface_cache[symbol] = (surface, chain_timestamp, fresh_until)
+    return surface
+
+def fresh_vol_surface(symbol):
+    """Cached volatility surface for a symbol if its source chains are all still fresh, without fetching"""
+    cached = vol_surface_cache.get(symbol)
+    if cached and time.time() < cached[2]:
+        return cached[0]
+    return None
+
+def parse_list_arg(name):
+    """Read a comma-separated or repeated query parameter as a list of strings"""
+    values = []
+    for raw in request.args.getlist(name):
+        values.extend(item.strip() for item in raw.split(',') if item.strip())
+    return values
+
 @app.route('/options-chain/<symbol>', methods=['GET'])
 def get_options_chain(symbol):
     """Get complete options chain for a symbol"""
     try:
         symbol = symbol.upper()
         
-        # Check cache first
-        cache_key = f"options_{symbol}"
-        current_time = time.time()
+        # format=records (default) | columnar | npz; precision rounds floats
+        wire_format = request.args.get('format', 'records')
+        if wire_format not in CHAIN_WIRE_FORMATS:
+            return jsonify({'success': False, 'error': f"format must be one of {', '.join(CHAIN_WIRE_FORMATS)}"}), 400
+        precision = request.args.get('precision', type=int)
         
-        if cache_key in options_cache:
-            cached_data, timestamp = options_cache[cache_key]
-            if current_time - timestamp < CACHE_DURATION:
-                return jsonify({
-                    'success': True,
-                    'cached': True,
-                    'data': cached_data,
-                    'source': 'cache'
-                })
+        # Only the requested expirations are loaded (default: the nearest one);
+        # expirationDates always lists every available date
+        expirations = parse_list_arg('expiration')
+        if not expirations:
+            index, _ = get_options_index(symbol)
+            expirations = index['expirationDates'][:1] if index else []
         
-        # Fetch fresh options data
-        options_data = options_engine.get_yahoo_options_data(symbol)
+        # The cache keeps the columnar form; the wire shape is built per response
+        options_data, _, cached = get_cached_options_chain(symbol, expirations)
         
         if options_data:
-            # Cache the result
-            options_cache[cache_key] = (options_data, current_time)
+            # Optional windowing runs on the cached chain and slices only matching rows
+            options_data = options_engine.filter_chain(
+                options_data,
+                side=request.args.get('side', 'both'),
+                min_strike=request.args.get('minStrike', type=float),
+                max_strike=request.args.get('maxStrike', type=float),
+                min_moneyness=request.args.get('minMoneyness', type=float),
+                max_moneyness=request.args.get('maxMoneyness', type=float),
+                min_abs_delta=request.args.get('minDelta', type=float),
+                max_abs_delta=request.args.get('maxDelta', type=float),
+                min_open_interest=request.args.get('minOpenInterest', type=int),
+                min_volume=request.args.get('minVolume', type=int)
+            )
+            
+            if wire_format == 'npz':
+                return Response(
+                    options_engine.chain_to_npz(options_data, precision),
+                    mimetype='application/octet-stream',
+                    headers={'Content-Disposition': f'attachment; filename={symbol}_options.npz',
+                             'X-Cache': 'cache' if cached else 'fresh'}
+                )
+            
+            if wire_format == 'columnar':
+                data = options_engine.chain_to_columns(options_data, precision)
+            else:
+                data = options_engine.chain_to_records(options_data)
             return jsonify({
                 'success': True,
-                'cached': False,
-                'data': options_data,
-                'source': 'fresh'
+                'cached': cached,
+                'data': data,
+                'source': 'cache' if cached else 'fresh'
             })
         else:
             return jsonify({'success': False, 'error': f'No options data available for {symbol}'}), 500
             
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e), 'traceback': traceback.format_exc()}), 500
 
+@app.route('/options-expirations/<symbol>', methods=['GET'])
+def get_options_expirations(symbol):
+    """List expiration dates without fetching chains, with each one's cache state"""
+    try:
+        symbol = symbol.upper()
+        index, cached = get_options_index(symbol)
+        if not index:
+            return jsonify({'success': False, 'error': f'No options data available for {symbol}'}), 500
+        
+        now = datetime.now()
+        current_time = time.time()
+        expirations = []
+        for exp_date in index['expirationDates']:
+            time_to_exp = (datetime.strptime(exp_date, '%Y-%m-%d') - now).days / 365.0
+            entry = expiration_cache.get((symbol, exp_date))
+            age = current_time - entry[1] if entry else None
+            expirations.append({
+                'expiration': exp_date,
+                'daysToExpiration': round(time_to_exp * 365),
+                'ttlSeconds': expiration_ttl(time_to_exp),
+                'loaded': entry is not None and age < expiration_ttl(entry[0]['timeToExpiration']),
+                'ageSeconds': round(age, 1) if entry else None
+            })
+        
+        return jsonify({
+            'success': True,
+            'cached': cached,
+            'data': {'symbol': symbol, 'currentPrice': index['currentPrice'], 'expirations': expirations}
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/options-smile/<symbol>', methods=['GET'])
+def get_options_smile(symbol):
+    """Fitted SVI smile parameters and residuals per expiration, optionally evaluated at strikes"""
+    try:
+        symbol = symbol.upper()
+        expirations = parse_list_arg('expiration')
+        strikes = np.array([float(strike) for strike in parse_list_arg('strike')])
+        
+        # Smiles are fitted when each expiration is loaded and cached with its chain
+        options_data, _, _ = get_cached_options_chain(symbol, expirations or None)
+        if not options_data:
+            return jsonify({'success': False, 'error': f'No options data available for {symbol}'}), 500
+        
+        smiles = {}
+        for exp_date, chain in options_data['chains'].items():
+            smile = chain.get('smile')
+            if smile is None:
+                smiles[exp_date] = None
+                continue
+            residuals = smile.residuals(chain)
+            entry = {
+                'parameters': smile.to_dict(),
+                'residuals': [
+                    {'strike': strike, 'type': 'call' if is_call else 'put', 'marketIV': round(market, 4),
+                     'fittedIV': round(fitted, 4), 'residual': round(residual, 4)}
+                    for strike, is_call, market, fitted, residual in zip(
+                        *(residuals[name].tolist() for name in ('strike', 'isCall', 'marketIV', 'fittedIV', 'residual'))
+                    )
+                ],
+                'maxAbsResidual': round(float(np.abs(residuals['residual']).max()), 4)
+            }
+            if len(strikes):
+                entry['smoothed'] = [{'strike': strike, 'impliedVolatility': round(vol, 4)}
+                                     for strike, vol in zip(strikes.tolist(), smile.implied_vol(strikes).tolist())]
+            smiles[exp_date] = entry
+        
+        return jsonify({
+            'success': True,
+            'data': {'symbol': symbol, 'currentPrice': options_data['currentPrice'], 'smiles': smiles}
+        })
+        
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/options-vol-surface/<symbol>', methods=['GET'])
+def get_options_vol_surface(symbol):
+    """Get the implied volatility surface, or evaluate it at (strike, expiration) points"""
+    try:
+        symbol = symbol.upper()
+        surface = get_vol_surface(symbol)
+        if surface is None:
+            return jsonify({'success': False, 'error': f'No options data available for {symbol}'}), 500
+        
+        strikes = [float(strike) for strike in parse_list_arg('strike')]
+        expirations = parse_list_arg('expiration')
+        if not strikes and not expirations:
+            return jsonify({'success': True, 'data': surface.to_dict()})
+        
+        if not strikes or not expirations:
+            return jsonify({'success': False, 'error': 'Both strike and expiration are required'}), 400
+        
+        # Single values broadcast against lists; otherwise points are paired
+        if len(strikes) != len(expirations) and 1 not in (len(strikes), len(expirations)):
+            return jsonify({'success': False, 'error': 'strike and expiration lists must have equal length'}), 400
+        
+        now = datetime.now()
+        tenors = [(datetime.strptime(exp, '%Y-%m-%d') - now).days / 365.0 for exp in expirations]
+        strike_array, tenor_array = np.broadcast_arrays(np.array(strikes), np.array(tenors))
+        vols = surface.implied_vol(strike_array, np.maximum(tenor_array, 1 / 365.0))
+        expiration_list = np.broadcast_to(np.array(expirations), strike_array.shape)
+        
+        points = [
+            {'strike': strike, 'expiration': exp, 'timeToExpiration': tenor, 'impliedVolatility': round(vol, 4)}
+            for strike, exp, tenor, vol in zip(strike_array.tolist(), expiration_list.tolist(),
+                                               tenor_array.tolist(), vols.tolist())
+        ]
+        return jsonify({'success': True, 'data': {'symbol': symbol, 'currentPrice': surface.spot, 'points': points}})
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/options-pricing/<symbol>', methods=['GET'])
 def calculate_options_pricing(symbol):
     """Calculate theoretical options prices using Black-Scholes"""
@@ -574,11 +866,11 @@ def calculate_options_pricing(symbol):
         option_type = request.args.get('type', 'call').lower()
         
         # Get current stock price
-        options_data = options_engine.get_yahoo_options_data(symbol)
-        if not options_data:
+        index, _ = get_options_index(symbol)
+        if not index:
             return jsonify({'success': False, 'error': 'Unable to fetch stock data'}), 500
         
-        current_price = options_data['currentPrice']
+        current_price = index['currentPrice']
         
         # Calculate time to expiration
         exp_date = datetime.strptime(expiration, '%Y-%m-%d')
@@ -587,19 +879,23 @@ def calculate_options_pricing(symbol):
         if time_to_exp <= 0:
             return jsonify({'success': False, 'error': 'Option has expired'}), 400
         
-        # Calculate theoretical price and Greeks
-        if option_type == 'call':
-            theoretical_price = options_engine.black_scholes_call(
-                current_price, strike, time_to_exp, options_engine.risk_free_rate, 0.25
-            )
+        # Price off the cached volatility surface, falling back to a flat 25%
+        try:
+            surface = get_vol_surface(symbol)
+        except ValueError:
+            surface = None  # Too few implied vols in the chain to build a surface
+        if surface is None:
+            volatility = 0.25
+            volatility_source = 'default'
         else:
-            theoretical_price = options_engine.black_scholes_put(
-                current_price, strike, time_to_exp, options_engine.risk_free_rate, 0.25
-            )
+            volatility = float(surface.implied_vol(strike, time_to_exp))
+            volatility_source = 'surface'
         
-        greeks = options_engine.calculate_greeks(
-            current_price, strike, time_to_exp, options_engine.risk_free_rate, 0.25, option_type
+        # Calculate theoretical price and Greeks in one pass
+        greeks = options_engine.calculate_greeks_batch(
+            current_price, strike, time_to_exp, options_engine.risk_free_rate, volatility, option_type
         )
+        theoretical_price = float(greeks.pop('price'))
         
         result = {
             'symbol': symbol,
@@ -609,7 +905,9 @@ def calculate_options_pricing(symbol):
             'type': option_type,
             'theoreticalPrice': round(theoretical_price, 2),
             'timeToExpiration': time_to_exp,
-            'greeks': greeks
+            'volatility': round(volatility, 4),
+            'volatilitySource': volatility_source,
+            'greeks': {name: round(float(value), 4) for name, value in greeks.items()}
         }
         
         return jsonify({'success': True, 'data': result})
@@ -624,10 +922,37 @@ def analyze_options_strategy():
         data = request.get_json()
         strategy_legs = data.get('legs', [])
         current_price = float(data.get('currentPrice', 100))
+        mode = data.get('mode', 'expiration')
         
         if not strategy_legs:
             return jsonify({'success': False, 'error': 'No strategy legs provided'}), 400
         
+        if mode == 'monte_carlo':
+            # Simulated P&L distribution; path count and time budget are capped per request
+            if 'expiration' in data:
+                exp_date = datetime.strptime(data['expiration'], '%Y-%m-%d')
+                time_to_exp = (exp_date - datetime.now()).days / 365.0
+            else:
+                time_to_exp = float(data.get('daysToExpiration', 30)) / 365.0
+            
+            n_paths = int(data.get('paths', 100000))
+            n_steps = int(data.get('steps', 50))
+            if n_paths < 2 or n_steps < 1:
+                return jsonify({'success': False, 'error': 'paths must be at least 2 and steps at least 1'}), 400
+            
+            try:
+                analysis = monte_carlo_engine.simulate_strategy(
+                    strategy_legs, current_price, time_to_exp,
+                    volatility=float(data.get('volatility', 0.25)),
+                    n_paths=min(n_paths, MAX_SIMULATION_PATHS),
+                    n_steps=min(n_steps, 252),
+                    time_budget=min(float(data.get('timeBudget', 2.0)), MAX_SIMULATION_SECONDS),
+                    seed=data.get('seed')
+                )
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+            return jsonify({'success': True, 'data': analysis})
+        
         # Analyze the strategy
         analysis = options_engine.analyze_strategy(strategy_legs, current_price)
         
@@ -636,6 +961,54 @@ def analyze_options_strategy():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e), 'traceback': traceback.format_exc()}), 500
 
+@app.route('/options-strategy-scan/<symbol>', methods=['GET'])
+def scan_options_strategies(symbol):
+    """Rank every strike combination of a strategy template on the cached chain"""
+    try:
+        symbol = symbol.upper()
+        template = request.args.get('template', 'iron_condor')
+        
+        # Default to the nearest expiration that hasn't expired; only that chain is loaded
+        expiration = request.args.get('expiration')
+        if expiration is None:
+            index, _ = get_options_index(symbol)
+            if not index:
+                return jsonify({'success': False, 'error': f'No options data available for {symbol}'}), 500
+            now = datetime.now()
+            live = [exp for exp in index['expirationDates'] if (datetime.strptime(exp, '%Y-%m-%d') - now).days > 0]
+            if not live:
+                return jsonify({'success': False, 'error': 'No unexpired chains available'}), 400
+            expiration = live[0]
+        
+        options_data, _, _ = get_cached_options_chain(symbol, [expiration])
+        if not options_data or not options_data['chains']:
+            return jsonify({'success': False, 'error': f'No options data available for {symbol}'}), 500
+        if expiration not in options_data['chains']:
+            return jsonify({'success': False, 'error': f'Expiration {expiration} is not loaded for {symbol}'}), 400
+        
+        candidates = strategy_scanner.scan(
+            options_data['chains'][expiration], options_data['currentPrice'], template,
+            top_k=min(request.args.get('top', 10, type=int), 100),
+            rank=request.args.get('rank', 'expectedValue'),
+            max_width=request.args.get('maxWidth', type=float),
+            max_short_delta=request.args.get('maxShortDelta', type=float),
+            min_probability=request.args.get('minProbability', 0.0, type=float)
+        )
+        
+        result = {
+            'symbol': symbol,
+            'currentPrice': options_data['currentPrice'],
+            'expiration': expiration,
+            'template': template,
+            'candidates': candidates
+        }
+        return jsonify({'success': True, 'data': result})
+        
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/options-strategies', methods=['GET'])
 def get_strategy_templates():
     """Get predefined options strategy templates"""
@@ -663,13 +1036,15 @@ def calculate_implied_volatility():
             return jsonify({'success': False, 'error': 'Option has expired'}), 400
         
         # Calculate implied volatility
-        iv = options_engine.implied_volatility(
-            market_price, current_price, strike, time_to_exp, 
+        iv, converged = options_engine.implied_volatility_batch(
+            market_price, current_price, strike, time_to_exp,
             options_engine.risk_free_rate, option_type
         )
+        converged = bool(converged)
         
         result = {
-            'impliedVolatility': iv,
+            'impliedVolatility': round(float(iv), 4) if converged else DEFAULT_VOLATILITY,
+            'converged': converged,
             'marketPrice': market_price,
             'strike': strike,
             'type': option_type,
@@ -689,15 +1064,13 @@ def calculate_payoff_diagram():
         strategy_legs = data.get('legs', [])
         current_price = float(data.get('currentPrice', 100))
         
-        # Create spot price range
-        spot_range = list(range(
-            int(current_price * 0.7), 
-            int(current_price * 1.3), 
-            int(current_price * 0.01)
-        ))
+        points = min(max(int(data.get('points', 61)), 2), MAX_PAYOFF_POINTS)
+        
+        # Create spot price range; cost is independent of resolution
+        spot_range = np.linspace(current_price * 0.7, current_price * 1.3, points).round(2).tolist()
         
         # Calculate payoffs
-        payoffs = options_engine.calculate_strategy_payoff(strategy_legs, spot_range)
+        payoffs = options_engine.calculate_strategy_payoff(strategy_legs, spot_range, current_price)
         
         result = {
             'spotPrices': spot_range,
@@ -710,6 +1083,121 @@ def calculate_payoff_diagram():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/options-pnl-surface', methods=['POST'])
+def calculate_pnl_surface():
+    """Mark-to-model P&L of a strategy over spot x days to expiration x volatility shift"""
+    try:
+        data = request.get_json()
+        strategy_legs = data.get('legs', [])
+        current_price = float(data.get('currentPrice', 100))
+        
+        if not strategy_legs:
+            return jsonify({'success': False, 'error': 'No strategy legs provided'}), 400
+        
+        # Per-leg days to expiration and implied volatility, with strategy-level defaults
+        default_days = float(data.get('daysToExpiration', 30))
+        default_vol = float(data.get('volatility', 0.25))
+        now = datetime.now()
+        leg_days, leg_vols = [], []
+        for leg in strategy_legs:
+            if 'expiration' in leg:
+                leg_days.append(float((datetime.strptime(leg['expiration'], '%Y-%m-%d') - now).days))
+            else:
+                leg_days.append(float(leg.get('daysToExpiration', default_days)))
+            leg_vols.append(float(leg.get('impliedVolatility', default_vol)))
+        option_days = [days for leg, days in zip(strategy_legs, leg_days) if leg['type'] != 'stock']
+        front_days = max(min(option_days), 0.0) if option_days else default_days
+        
+        spot_low, spot_high = data.get('spotRange', [0.7, 1.3])
+        spot_points = min(max(int(data.get('spotPoints', 50)), 2), MAX_SURFACE_SPOTS)
+        day_points = min(max(int(data.get('dayPoints', min(int(front_days) + 1, 30))), 2), MAX_SURFACE_DAYS)
+        vol_shifts = data.get('volShifts', np.linspace(-0.10, 0.10, 11).round(4).tolist())[:MAX_SURFACE_VOL_SHIFTS]
+        
+        spot_prices = np.linspace(current_price * float(spot_low), current_price * float(spot_high), spot_points)
+        days_remaining = np.linspace(front_days, 0.0, day_points)
+        
+        surface = options_engine.strategy_pnl_surface(
+            strategy_legs, current_price, spot_prices, days_remaining, vol_shifts, leg_days, leg_vols
+        )
+        
+        result = {
+            'currentPrice': current_price,
+            'spotPrices': spot_prices.round(2).tolist(),
+            'daysToExpiration': days_remaining.round(2).tolist(),
+            'volShifts': [float(shift) for shift in vol_shifts],
+            'pnl': surface.round(2).tolist()  # Indexed [spot][day][vol shift]
+        }
+        
+        return jsonify({'success': True, 'data': result})
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def prepare_positions(positions, data):
+    """
+    Build position arrays and spot prices for a risk request
+    Spot is resolved once per distinct underlying: caller-supplied 'spots' and
+    fresh cached chains need no fetch, the rest are quoted concurrently.
+    Positions without an explicit IV use an already-cached surface while its source chains are fresh.
+    """
+    arrays = options_engine.position_arrays(positions, float(data.get('volatility', 0.25)))
+    
+    spots = {symbol.upper(): float(price) for symbol, price in data.get('spots', {}).items()}
+    for symbol in set(arrays['symbol'].tolist()) - set(spots):
+        cached = options_cache.get(f"options_{symbol}")
+        if cached and time.time() - cached[1] < OPTIONS_INDEX_TTL:
+            spots[symbol] = float(cached[0]['currentPrice'])
+    spots.update(options_engine.get_quotes(set(arrays['symbol'].tolist()) - set(spots)))
+    
+    explicit_vol = np.array(['impliedVolatility' in position for position in positions])
+    for symbol in set(arrays['symbol'].tolist()):
+        surface = fresh_vol_surface(symbol)
+        mask = (arrays['symbol'] == symbol) & ~explicit_vol
+        if surface is not None and mask.any():
+            arrays['volatility'][mask] = surface.implied_vol(
+                arrays['strike'][mask], np.maximum(arrays['tenor'][mask], 1 / 365.0)
+            )
+    
+    return arrays, spots
+
+@app.route('/options-portfolio-greeks', methods=['POST'])
+def calculate_portfolio_greeks():
+    """Aggregate Greeks across many option positions, per underlying and in total"""
+    try:
+        data = request.get_json()
+        positions = data.get('positions', [])
+        
+        if not positions:
+            return jsonify({'success': False, 'error': 'No positions provided'}), 400
+        
+        arrays, spots = prepare_positions(positions, data)
+        result = options_engine.portfolio_greeks(arrays, spots)
+        return jsonify({'success': True, 'data': result})
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/options-stress-test', methods=['POST'])
+def run_stress_test():
+    """Full-revaluation P&L of option positions under stress scenarios"""
+    try:
+        data = request.get_json()
+        positions = data.get('positions', [])
+        
+        if not positions:
+            return jsonify({'success': False, 'error': 'No positions provided'}), 400
+        
+        scenarios = stress_engine.build_scenarios(data.get('scenarios'), data.get('grid'))
+        if len(scenarios) > MAX_STRESS_SCENARIOS:
+            return jsonify({'success': False, 'error': f'At most {MAX_STRESS_SCENARIOS} scenarios per request'}), 400
+        
+        arrays, spots = prepare_positions(positions, data)
+        result = stress_engine.run(arrays, spots, scenarios, bool(data.get('includePositions', False)))
+        return jsonify({'success': True, 'data': result})
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 # ==================== CACHE MANAGEMENT ====================
 
 @app.route('/cache/status', methods=['GET'])
@@ -720,14 +1208,19 @@ def cache_status():
     return jsonify({
         'prediction_cache_size': prediction_count,
         'options_cache_size': options_count,
-        'cache_duration_seconds': CACHE_DURATION
+        'expiration_cache_size': len(expiration_cache),
+        'vol_surface_cache_size': len(vol_surface_cache),
+        'cache_duration_seconds': CACHE_DURATION,
+        'single_flight': upstream_flights.stats()
     })
 
 @app.route('/cache/clear', methods=['POST'])
 def clear_cache():
-    global prediction_cache, options_cache
+    global prediction_cache, options_cache, expiration_cache, vol_surface_cache
     prediction_cache = {}
     options_cache = {}
+    expiration_cache = {}
+    vol_surface_cache = {}
     return jsonify({'success': True, 'message': 'All caches cleared'})
 
 @app.route('/cache/clear-predictions', methods=['POST'])
@@ -738,8 +1231,10 @@ def clear_prediction_cache():
 
 @app.route('/cache/clear-options', methods=['POST'])
 def clear_options_cache():
-    global options_cache
+    global options_cache, expiration_cache, vol_surface_cache
     options_cache = {}
+    expiration_cache = {}
+    vol_surface_cache = {}
     return jsonify({'success': True, 'message': 'Options cache cleared'})
 
 if __name__ == '__main__':
@@ -747,8 +1242,15 @@ if __name__ == '__main__':
     print("📊 Available endpoints:")
     print("   - Stock Predictions: /predict/<symbol>")
     print("   - Options Chains: /options-chain/<symbol>")
+    print("   - Options Expirations: /options-expirations/<symbol>")
     print("   - Options Pricing: /options-pricing/<symbol>")
+    print("   - Volatility Surface: /options-vol-surface/<symbol>")
+    print("   - SVI Smiles: /options-smile/<symbol>")
     print("   - Strategy Analysis: /options-strategy-analysis")
+    print("   - Strategy Scanner: /options-strategy-scan/<symbol>")
     print("   - Payoff Diagrams: /options-payoff")
+    print("   - P&L Surface: /options-pnl-surface")
+    print("   - Portfolio Greeks: /options-portfolio-greeks")
+    print("   - Stress Testing: /options-stress-test")
     print("🚀 Server running on http://localhost:5000")
     app.run(debug=True, host='0.0.0.0', port=5000) 
\ No newline at end of file
@@ -3,6 +3,7 @@ from flask_cors import CORS
 import json
 import os
 from stock_predictor import get_stock_prediction
+from ohlcv_store import history_store
 import threading
 import time
 
@@ -88,6 +89,11 @@ def predict_batch():
                 "error": "No symbols provided"
             }), 400
         
+        # One grouped download for every symbol not already cached; predictors read from the panel
+        uncached = [symbol for symbol in symbols
+                    if not is_cache_valid(prediction_cache.get(f"{symbol.upper()}_{days}", (None, 0))[1])]
+        panel = history_store.preload(uncached, "5y")
+        
         results = {}
         for symbol in symbols:
             try:
@@ -106,7 +112,7 @@ def predict_batch():
                         continue
                 
                 # Generate fresh prediction
-                prediction = get_stock_prediction(symbol, days)
+                prediction = get_stock_prediction(symbol, days, history=panel.get_history)
                 
                 if prediction:
                     prediction_cache[cache_key] = (prediction, time.time())
@@ -173,13 +179,11 @@ def predict_simple(symbol):
         symbol = symbol.upper()
         
         # Use a simpler prediction for faster response
-        import yfinance as yf
-        import pandas as pd
         from datetime import datetime, timedelta
+        from ohlcv_store import get_history
         
         # Fetch recent data
-        stock = yf.Ticker(symbol)
-        data = stock.history(period="1y")
+        data = get_history(symbol, "1y")
         
         if data.empty:
             return jsonify({
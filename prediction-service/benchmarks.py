@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Offline performance benchmarks for the options engine
+Usage: python benchmarks.py lattice [--strikes N] [--steps N] [--repeat N]
+       python benchmarks.py wire [--strikes N] [--expirations N] [--precision N] [--repeat N]
+       python benchmarks.py iv [--strikes N] [--repeat N] [--output report.json]
+       python benchmarks.py load [--symbols A,B] [--requests N] [--concurrency N] [--endpoints predict,options-chain]
+"""
+
+import argparse
+import gzip
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from market_data import StaticMarketData
+from options_pricing import OptionsPricingEngine
+
+# Synthetic IV test grid: base volatility regimes and tenors in days
+IV_REGIMES = {'low': 0.10, 'normal': 0.25, 'high': 0.60, 'extreme': 1.50}
+IV_TENOR_DAYS = (7, 30, 90, 365, 730)
+# Below a cent of time value the price barely depends on vol, so IV is ill-posed
+MIN_TIME_VALUE = 0.01
+
+
+def time_call(func, repeat):
+    """Best wall time in seconds over `repeat` runs"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def synthetic_chain(engine, spot=100.0, n_strikes=100, n_expirations=6, symbol='BENCH'):
+    """Processed chain for quotes priced off a simple volatility smile, with no network access"""
+    chains = {}
+    strikes = np.round(np.linspace(spot * 0.6, spot * 1.4, n_strikes), 1)
+    today = datetime.now()
+    for index in range(n_expirations):
+        exp_date = (today + timedelta(days=7 + 30 * index)).strftime('%Y-%m-%d')
+        tenor = (7 + 30 * index) / 365.0
+        vols = 0.22 + 0.4 * np.log(strikes / spot) ** 2
+        frames = []
+        for option_type in ('call', 'put'):
+            price = np.round(engine.black_scholes_price(spot, strikes, tenor, engine.risk_free_rate, vols, option_type), 2)
+            frames.append(pd.DataFrame({
+                'strike': strikes, 'lastPrice': price,
+                'bid': np.maximum(price - 0.05, 0.0), 'ask': price + 0.05,
+                'volume': np.arange(n_strikes) * 3, 'openInterest': np.arange(n_strikes) * 10
+            }))
+        chains[exp_date] = tuple(frames)
+
+    engine.provider = StaticMarketData({symbol: spot}, {symbol: chains})
+    engine.max_expirations = n_expirations
+    return engine.get_options_chain(symbol)
+
+
+def benchmark_lattice(args):
+    """American lattice over a strike grid vs the scalar Black-Scholes path"""
+    engine = OptionsPricingEngine()
+    spot, tenor, rate, vol = 100.0, 0.5, engine.risk_free_rate, 0.3
+    strikes = np.linspace(spot * 0.5, spot * 1.5, args.strikes)
+
+    scalar_seconds = time_call(
+        lambda: [engine.black_scholes_put(spot, strike, tenor, rate, vol) for strike in strikes], args.repeat
+    )
+    vector_seconds = time_call(
+        lambda: engine.black_scholes_price(spot, strikes, tenor, rate, vol, 'put'), args.repeat
+    )
+    lattice_seconds = time_call(
+        lambda: engine.american_option_price(spot, strikes, tenor, rate, vol, 'put', steps=args.steps), args.repeat
+    )
+    premium = (engine.american_option_price(spot, strikes, tenor, rate, vol, 'put', steps=args.steps)
+               - engine.black_scholes_price(spot, strikes, tenor, rate, vol, 'put'))
+
+    return {
+        'benchmark': 'lattice',
+        'strikes': args.strikes,
+        'steps': args.steps,
+        'contractsPerSecond': {
+            'scalarBlackScholes': args.strikes / scalar_seconds,
+            'vectorBlackScholes': args.strikes / vector_seconds,
+            'americanLattice': args.strikes / lattice_seconds,
+        },
+        'maxEarlyExercisePremium': float(premium.max()),
+    }
+
+
+def benchmark_wire(args):
+    """Payload size and serialization time of each /options-chain response format"""
+    engine = OptionsPricingEngine()
+    options_data = synthetic_chain(engine, n_strikes=args.strikes, n_expirations=args.expirations)
+
+    encoders = {
+        'records': lambda: json.dumps(engine.chain_to_records(options_data)).encode(),
+        'columnar': lambda: json.dumps(engine.chain_to_columns(options_data)).encode(),
+        'columnarRounded': lambda: json.dumps(engine.chain_to_columns(options_data, args.precision)).encode(),
+        'npz': lambda: engine.chain_to_npz(options_data),
+        'npzRounded': lambda: engine.chain_to_npz(options_data, args.precision),
+    }
+
+    formats = {}
+    for name, encode in encoders.items():
+        payload = encode()
+        formats[name] = {
+            'bytes': len(payload),
+            'gzipBytes': len(gzip.compress(payload)),
+            'milliseconds': time_call(encode, args.repeat) * 1000,
+        }
+
+    baseline = formats['records']['bytes']
+    for entry in formats.values():
+        entry['sizeRatio'] = entry['bytes'] / baseline
+
+    return {
+        'benchmark': 'wire',
+        'contracts': 2 * args.strikes * args.expirations,
+        'precision': args.precision,
+        'formats': formats,
+    }
+
+
+def benchmark_iv(args):
+    """
+    Implied volatility solver speed and accuracy on chains with known vols
+    Each chain is one (regime, tenor, side) slice over a 0.5x-1.5x strike grid
+    with a quadratic smile; prices are exact Black-Scholes values, so any
+    error comes from the solver. 'quotable' figures cover contracts with at
+    least MIN_TIME_VALUE of time value, where the vol is actually identifiable.
+    """
+    engine = OptionsPricingEngine()
+    spot, rate = 100.0, engine.risk_free_rate
+    strikes = np.linspace(spot * 0.5, spot * 1.5, args.strikes)
+    moneyness = np.log(strikes / spot)
+
+    chains = []
+    for regime, base_vol in IV_REGIMES.items():
+        for days in IV_TENOR_DAYS:
+            for option_type in ('call', 'put'):
+                tenor = days / 365.0
+                vols = base_vol * (1 + 0.8 * moneyness ** 2 - 0.2 * moneyness)
+                prices = engine.black_scholes_price(spot, strikes, tenor, rate, vols, option_type)
+                discounted_strike = strikes * np.exp(-rate * tenor)
+                intrinsic = np.maximum(spot - discounted_strike if option_type == 'call'
+                                       else discounted_strike - spot, 0.0)
+                chains.append({'regime': regime, 'days': days, 'type': option_type, 'tenor': tenor,
+                               'vols': vols, 'prices': prices, 'timeValue': prices - intrinsic})
+
+    chain_seconds, results = [], []
+    for chain in chains:
+        solve = lambda: engine.implied_volatility_batch(
+            chain['prices'], spot, strikes, chain['tenor'], rate, chain['type']
+        )
+        chain_seconds.append(time_call(solve, args.repeat))
+        iv, converged = solve()
+        newton_only = engine.implied_volatility_batch(
+            chain['prices'], spot, strikes, chain['tenor'], rate, chain['type'], max_bisect_iter=0
+        )[1]
+        results.append((chain, iv, converged, newton_only))
+
+    # Scalar path on a sample of contracts, for the per-call API
+    sample = chains[len(chains) // 2]
+    scalar_seconds = time_call(lambda: [
+        engine.implied_volatility(price, spot, strike, sample['tenor'], rate, sample['type'])
+        for price, strike in zip(sample['prices'], strikes)
+    ], 1)
+
+    def summarize(selected):
+        converged = np.concatenate([result[2] for result in selected])
+        newton_only = np.concatenate([result[3] for result in selected])
+        quotable = np.concatenate([result[0]['timeValue'] >= MIN_TIME_VALUE for result in selected])
+        errors = np.concatenate([np.where(result[2], np.abs(result[1] - result[0]['vols']), np.nan)
+                                 for result in selected])
+        quotable_errors = errors[quotable & converged]
+        return {
+            'contracts': int(converged.size),
+            'quotableContracts': int(quotable.sum()),
+            'maxAbsError': float(np.nanmax(errors)) if converged.any() else None,
+            'quotableMaxAbsError': float(quotable_errors.max()) if quotable_errors.size else None,
+            'fallbackRate': float(1 - converged.mean()),
+            'quotableFallbackRate': float(1 - converged[quotable].mean()) if quotable.any() else None,
+            'bisectionRate': float((converged & ~newton_only).mean()),
+        }
+
+    chain_ms = np.array(chain_seconds) * 1000
+    total_contracts = len(chains) * args.strikes
+    return {
+        'benchmark': 'iv',
+        'chains': len(chains),
+        'strikesPerChain': args.strikes,
+        'contractsPerSecond': {
+            'batch': total_contracts / sum(chain_seconds),
+            'scalar': args.strikes / scalar_seconds,
+        },
+        'chainMilliseconds': {
+            'p50': float(np.percentile(chain_ms, 50)),
+            'p99': float(np.percentile(chain_ms, 99)),
+            'max': float(chain_ms.max()),
+        },
+        'accuracy': summarize(results),
+        'byRegime': {regime: summarize([result for result in results if result[0]['regime'] == regime])
+                     for regime in IV_REGIMES},
+        'byTenorDays': {str(days): summarize([result for result in results if result[0]['days'] == days])
+                        for days in IV_TENOR_DAYS},
+    }
+
+
+def benchmark_load(args):
+    """
+    Request throughput of the advanced app through the Flask test client
+    Runs on the synthetic market data provider unless MARKET_DATA_PROVIDER
+    says otherwise, so no network access is needed. The first request per
+    symbol and endpoint is a cold fetch; the rest show cached throughput.
+    """
+    os.environ.setdefault('MARKET_DATA_PROVIDER', 'synthetic')
+    import advanced_app  # Imported here so the provider choice above applies
+
+    symbols = args.symbols.split(',')
+    urls = [f"/{endpoint}/{symbol}" for endpoint in args.endpoints.split(',') for symbol in symbols]
+
+    def request_url(url):
+        start = time.perf_counter()
+        status = advanced_app.app.test_client().get(url).status_code
+        return url, status, time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        started = time.perf_counter()
+        results = list(executor.map(request_url, (urls[index % len(urls)] for index in range(args.requests))))
+        elapsed = time.perf_counter() - started
+
+    by_endpoint = {}
+    for endpoint in args.endpoints.split(','):
+        millis = np.array([seconds * 1000 for url, _, seconds in results if url.startswith(f"/{endpoint}/")])
+        by_endpoint[endpoint] = {
+            'requests': len(millis),
+            'milliseconds': {'p50': float(np.percentile(millis, 50)), 'p99': float(np.percentile(millis, 99)),
+                             'max': float(millis.max())},
+        }
+
+    return {
+        'benchmark': 'load',
+        'provider': os.environ['MARKET_DATA_PROVIDER'],
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'errors': sum(status != 200 for _, status, _ in results),
+        'requestsPerSecond': args.requests / elapsed,
+        'byEndpoint': by_endpoint,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    lattice = subparsers.add_parser('lattice', help='American lattice pricer throughput')
+    lattice.add_argument('--strikes', type=int, default=200)
+    lattice.add_argument('--steps', type=int, default=200)
+    lattice.add_argument('--repeat', type=int, default=5)
+    lattice.set_defaults(run=benchmark_lattice)
+
+    wire = subparsers.add_parser('wire', help='/options-chain payload size and serialization time')
+    wire.add_argument('--strikes', type=int, default=100)
+    wire.add_argument('--expirations', type=int, default=6)
+    wire.add_argument('--precision', type=int, default=4)
+    wire.add_argument('--repeat', type=int, default=5)
+    wire.set_defaults(run=benchmark_wire)
+
+    iv = subparsers.add_parser('iv', help='Implied volatility solver speed, accuracy and fallback rate')
+    iv.add_argument('--strikes', type=int, default=201)
+    iv.add_argument('--repeat', type=int, default=5)
+    iv.set_defaults(run=benchmark_iv)
+
+    load = subparsers.add_parser('load', help='/predict and /options-chain throughput without network access')
+    load.add_argument('--symbols', default='AAPL,MSFT,TSLA,NVDA')
+    load.add_argument('--endpoints', default='predict,options-chain')
+    load.add_argument('--requests', type=int, default=200)
+    load.add_argument('--concurrency', type=int, default=8)
+    load.set_defaults(run=benchmark_load)
+
+    for subparser in (lattice, wire, iv, load):
+        subparser.add_argument('--output', help='Also write the JSON report to this file')
+
+    args = parser.parse_args()
+    report = json.dumps(args.run(args), indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, 'w') as handle:
+            handle.write(report + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,408 @@
+"""
+Market data sources shared by the apps, predictors and the options engine
+Every provider serves the same calls: get_history (and get_histories for a
+batch of symbols), get_quote, get_expirations and get_option_chain.
+- YahooMarketData fetches live data through yfinance
+- SyntheticMarketData generates deterministic seeded prices and option chains
+- ReplayMarketData serves files written by RecordingMarketData
+- StaticMarketData serves in-memory chains for tests and benchmarks
+create_market_data() picks one from the environment so whole services can run
+without network access.
+"""
+
+import json
+import os
+import threading
+import time
+import zlib
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+from scipy.special import ndtr
+
+
+def period_start(period, now=None):
+    """First timestamp covered by a yfinance-style period ('1y', '6mo', 'ytd'), or None for 'max'"""
+    now = pd.Timestamp.now(tz='UTC') if now is None else now
+    if period == 'max':
+        return None
+    if period == 'ytd':
+        return now.normalize().replace(month=1, day=1)
+    for suffix, unit in (('mo', 'months'), ('y', 'years'), ('d', 'days')):
+        if period.endswith(suffix) and period[:-len(suffix)].isdigit():
+            return (now - pd.DateOffset(**{unit: int(period[:-len(suffix)])})).normalize()
+    raise ValueError(f"Unsupported period: {period}")
+
+
+def slice_history(frame, period=None, start=None):
+    """Rows of a tz-aware daily history frame inside a period or from a start date"""
+    if start is not None:
+        first = pd.Timestamp(start)
+        first = first.tz_localize(frame.index.tz) if first.tz is None else first
+    else:
+        first = period_start(period or '1mo')
+    return frame if first is None else frame[frame.index >= first]
+
+
+class YahooMarketData:
+    """History, quotes, expirations and option chains from Yahoo Finance"""
+
+    name = 'yahoo'
+
+    def get_history(self, symbol, period=None, start=None):
+        """Daily bars for a period ('5y', 'max', ...) or from a start date"""
+        ticker = yf.Ticker(symbol)
+        if start is not None:
+            return ticker.history(start=start)
+        return ticker.history(period=period)
+
+    def get_histories(self, symbols, period=None, start=None):
+        """Daily bars for several symbols in one grouped download: {symbol: DataFrame}"""
+        symbols = list(symbols)
+        data = yf.download(symbols, period=None if start is not None else period, start=start,
+                           group_by='ticker', actions=True, auto_adjust=True, ignore_tz=False,
+                           threads=True, progress=False)
+        if not isinstance(data.columns, pd.MultiIndex):
+            data = pd.concat({symbols[0]: data}, axis=1)
+        frames = {}
+        for symbol in symbols:
+            if symbol in data.columns.get_level_values(0):
+                # The grouped frame spans every symbol's dates; keep the days this one traded
+                frame = data[symbol].dropna(subset=['Close'])
+                frame.index.name = 'Date'
+                frames[symbol] = frame
+        return frames
+
+    def get_quote(self, symbol):
+        """Current price for a symbol"""
+        stock_info = yf.Ticker(symbol).info
+        return stock_info.get('currentPrice', stock_info.get('regularMarketPrice', 100))
+
+    def get_expirations(self, symbol):
+        """Listed option expiration dates as 'YYYY-MM-DD' strings"""
+        return list(yf.Ticker(symbol).options)
+
+    def get_option_chain(self, symbol, expiration):
+        """Raw (calls, puts) DataFrames for one expiration"""
+        opt_chain = yf.Ticker(symbol).option_chain(expiration)
+        return opt_chain.calls, opt_chain.puts
+
+
+class SyntheticMarketData:
+    """
+    Deterministic offline market generated from a seed
+    Each symbol gets its own starting price, volatility and GBM path of daily
+    bars from a fixed start date, so earlier bars never change as days pass.
+    Option chains use weekly, monthly and LEAPS expirations, strike ladders
+    that widen with price and tenor, a skewed smile and tick-rounded quotes.
+    latency: seconds to sleep per call, to mimic a network round trip
+    """
+
+    name = 'synthetic'
+    HISTORY_START = '2010-01-04'
+    TIMEZONE = 'America/New_York'
+    RATE = 0.05
+
+    def __init__(self, seed=0, latency=0.0):
+        self.seed = seed
+        self.latency = latency
+        self._histories = {}
+        self._lock = threading.Lock()
+
+    def _rng(self, *keys):
+        return np.random.default_rng([self.seed] + [zlib.crc32(str(key).encode()) for key in keys])
+
+    def _profile(self, symbol):
+        """(starting price, annual volatility) for a symbol"""
+        rng = self._rng(symbol, 'profile')
+        return float(np.exp(rng.uniform(np.log(10), np.log(500)))), float(rng.uniform(0.15, 0.6))
+
+    def _pause(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _full_history(self, symbol):
+        today = pd.Timestamp.now(tz=self.TIMEZONE).normalize()
+        key = (symbol, today)
+        with self._lock:
+            if key in self._histories:
+                return self._histories[key]
+
+        dates = pd.bdate_range(self.HISTORY_START, today.tz_localize(None), tz=self.TIMEZONE, name='Date')
+        start_price, vol = self._profile(symbol)
+        rng = self._rng(symbol, 'history')
+        # Draws are sequential, so adding days never changes earlier bars
+        shocks = rng.standard_normal((len(dates), 4))
+        dt = 1 / 252
+        log_returns = (0.07 - 0.5 * vol ** 2) * dt + vol * np.sqrt(dt) * shocks[:, 0]
+        close = start_price * np.exp(np.cumsum(log_returns))
+        open_ = np.concatenate([[start_price], close[:-1]]) * np.exp(0.2 * vol * np.sqrt(dt) * shocks[:, 1])
+        high = np.maximum(open_, close) * np.exp(np.abs(shocks[:, 2]) * 0.3 * vol * np.sqrt(dt))
+        low = np.minimum(open_, close) * np.exp(-np.abs(shocks[:, 3]) * 0.3 * vol * np.sqrt(dt))
+        volume = (2e6 * np.exp(0.4 * shocks[:, 2] + 3 * np.abs(log_returns))).astype(np.int64)
+
+        frame = pd.DataFrame({
+            'Open': open_.round(2), 'High': high.round(2), 'Low': low.round(2), 'Close': close.round(2),
+            'Volume': volume, 'Dividends': 0.0, 'Stock Splits': 0.0
+        }, index=dates)
+        with self._lock:
+            # Paths generated on earlier days are dropped
+            self._histories = {cached: value for cached, value in self._histories.items() if cached[1] == today}
+            self._histories[key] = frame
+        return frame
+
+    def get_history(self, symbol, period=None, start=None):
+        self._pause()
+        return slice_history(self._full_history(symbol.upper()), period, start).copy()
+
+    def get_histories(self, symbols, period=None, start=None):
+        self._pause()
+        return {symbol: slice_history(self._full_history(symbol.upper()), period, start).copy() for symbol in symbols}
+
+    def get_quote(self, symbol):
+        self._pause()
+        return float(self._full_history(symbol.upper())['Close'].iloc[-1])
+
+    def get_expirations(self, symbol):
+        """Four weeklies, six monthlies (third Fridays) and two January LEAPS"""
+        self._pause()
+        today = date.today()
+        next_friday = today + timedelta(days=(4 - today.weekday()) % 7 or 7)
+        expirations = {next_friday + timedelta(weeks=week) for week in range(4)}
+        for offset in range(1, 7):
+            month_start = date(today.year + (today.month + offset - 1) // 12, (today.month + offset - 1) % 12 + 1, 1)
+            expirations.add(month_start + timedelta(days=(4 - month_start.weekday()) % 7 + 14))
+        for years in (1, 2):
+            january = date(today.year + years, 1, 1)
+            expirations.add(january + timedelta(days=(4 - january.weekday()) % 7 + 14))
+        return sorted(expiration.isoformat() for expiration in expirations)
+
+    def _strike_ladder(self, spot, vol, tenor):
+        """Listed strikes: a fine step near the money and double that further out"""
+        step = next(size for limit, size in ((25, 0.5), (100, 1.0), (250, 2.5), (1000, 5.0), (np.inf, 10.0))
+                    if spot < limit)
+        reach = 4 * vol * np.sqrt(tenor) + 0.05
+        lower, upper = spot * np.exp(-reach), spot * np.exp(reach)
+        near = np.arange(np.floor(spot * 0.9 / step) * step, spot * 1.1 + step, step)
+        wings = np.arange(np.floor(lower / (2 * step)) * 2 * step, upper + 2 * step, 2 * step)
+        strikes = np.union1d(near, wings)
+        return strikes[(strikes > 0) & (strikes >= lower - step) & (strikes <= upper + step)]
+
+    def get_option_chain(self, symbol, expiration):
+        symbol = symbol.upper()
+        spot = self.get_quote(symbol)
+        _, base_vol = self._profile(symbol)
+        tenor = max((date.fromisoformat(expiration) - date.today()).days, 1) / 365.0
+        strikes = self._strike_ladder(spot, base_vol, tenor)
+        forward = spot * np.exp(self.RATE * tenor)
+        moneyness = np.log(strikes / forward)
+        vols = base_vol * (1 + 0.1 * np.exp(-4 * tenor)) * (1 + 0.6 * moneyness ** 2 - 0.25 * moneyness)
+
+        rng = self._rng(symbol, expiration, date.today().isoformat())
+        vol_sqrt_t = vols * np.sqrt(tenor)
+        d1 = (np.log(spot / strikes) + (self.RATE + 0.5 * vols ** 2) * tenor) / vol_sqrt_t
+        d2 = d1 - vol_sqrt_t
+        discounted_strike = strikes * np.exp(-self.RATE * tenor)
+        frames = []
+        for option_type, price in (
+            ('C', spot * ndtr(d1) - discounted_strike * ndtr(d2)),
+            ('P', discounted_strike * ndtr(-d2) - spot * ndtr(-d1)),
+        ):
+            # Quotes on a penny tick below $3 and a nickel tick above
+            tick = np.where(price < 3, 0.01, 0.05)
+            half_spread = np.maximum(0.02 * price, tick)
+            bid = np.maximum(np.floor((price - half_spread) / tick) * tick, 0.0)
+            ask = np.ceil((price + half_spread) / tick) * tick
+            activity = np.exp(-8 * np.abs(moneyness) / np.sqrt(max(tenor, 0.05)))
+            volume = rng.poisson(1500 * activity)
+            last = np.where(volume > 0, np.round(price * (1 + rng.normal(0, 0.01, len(price))), 2), 0.0)
+            frames.append(pd.DataFrame({
+                'contractSymbol': [f"{symbol}{expiration.replace('-', '')[2:]}{option_type}{int(strike * 1000):08d}"
+                                   for strike in strikes],
+                'strike': strikes,
+                'lastPrice': np.maximum(last, 0.0),
+                'bid': bid.round(2),
+                'ask': ask.round(2),
+                'volume': volume,
+                'openInterest': rng.poisson(8000 * activity),
+                'impliedVolatility': vols.round(4),
+                'inTheMoney': strikes < spot if option_type == 'C' else strikes > spot,
+            }))
+        return frames[0], frames[1]
+
+
+class ReplayMarketData:
+    """
+    Serve market data recorded by RecordingMarketData
+    Layout under directory/<SYMBOL>/: quote.json, expirations.json,
+    history.csv (+ history.json with the timezone) and chains/<exp>.calls.csv,
+    chains/<exp>.puts.csv.
+    """
+
+    name = 'replay'
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, symbol, *parts):
+        return os.path.join(self.directory, symbol.upper(), *parts)
+
+    def _load_json(self, symbol, name):
+        with open(self._path(symbol, name)) as handle:
+            return json.load(handle)
+
+    def get_history(self, symbol, period=None, start=None):
+        timezone = self._load_json(symbol, 'history.json')['timezone']
+        frame = pd.read_csv(self._path(symbol, 'history.csv'), index_col='Date')
+        frame.index = pd.to_datetime(frame.index, utc=True).tz_convert(timezone)
+        return slice_history(frame, period, start)
+
+    def get_histories(self, symbols, period=None, start=None):
+        return {symbol: self.get_history(symbol, period, start) for symbol in symbols
+                if os.path.exists(self._path(symbol, 'history.csv'))}
+
+    def get_quote(self, symbol):
+        return self._load_json(symbol, 'quote.json')['price']
+
+    def get_expirations(self, symbol):
+        return self._load_json(symbol, 'expirations.json')
+
+    def get_option_chain(self, symbol, expiration):
+        return tuple(pd.read_csv(self._path(symbol, 'chains', f"{expiration}.{side}.csv"))
+                     for side in ('calls', 'puts'))
+
+
+class RecordingMarketData:
+    """Pass calls through to another provider and save every response for ReplayMarketData"""
+
+    def __init__(self, provider, directory):
+        self.provider = provider
+        self.directory = directory
+        self.name = f"{provider.name}-recording"
+        self._lock = threading.Lock()
+
+    def _path(self, symbol, *parts):
+        path = os.path.join(self.directory, symbol.upper(), *parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def _save_json(self, symbol, name, value):
+        with open(self._path(symbol, name), 'w') as handle:
+            json.dump(value, handle)
+
+    def get_history(self, symbol, period=None, start=None):
+        return self._record_history(symbol, self.provider.get_history(symbol, period=period, start=start))
+
+    def get_histories(self, symbols, period=None, start=None):
+        frames = self.provider.get_histories(symbols, period=period, start=start)
+        return {symbol: self._record_history(symbol, frame) for symbol, frame in frames.items()}
+
+    def _record_history(self, symbol, frame):
+        if frame.empty:
+            return frame
+        with self._lock:
+            # Recorded bars accumulate across calls so replay can serve any recorded window
+            path = self._path(symbol, 'history.csv')
+            if os.path.exists(path):
+                recorded = pd.read_csv(path, index_col='Date')
+                recorded.index = pd.to_datetime(recorded.index, utc=True).tz_convert(frame.index.tz)
+                combined = pd.concat([recorded[recorded.index < frame.index[0]], frame])
+            else:
+                combined = frame
+            combined.to_csv(path, index_label='Date')
+            self._save_json(symbol, 'history.json', {'timezone': str(frame.index.tz)})
+        return frame
+
+    def get_quote(self, symbol):
+        price = self.provider.get_quote(symbol)
+        self._save_json(symbol, 'quote.json', {'price': price})
+        return price
+
+    def get_expirations(self, symbol):
+        expirations = list(self.provider.get_expirations(symbol))
+        self._save_json(symbol, 'expirations.json', expirations)
+        return expirations
+
+    def get_option_chain(self, symbol, expiration):
+        calls, puts = self.provider.get_option_chain(symbol, expiration)
+        for side, frame in (('calls', calls), ('puts', puts)):
+            frame.to_csv(self._path(symbol, 'chains', f"{expiration}.{side}.csv"), index=False)
+        return calls, puts
+
+
+class StaticMarketData:
+    """
+    Local stand-in provider backed by in-memory data
+    quotes: {symbol: price}
+    chains: {symbol: {expiration: (calls_df, puts_df)}}
+    histories: {symbol: daily bars DataFrame}
+    latency: seconds to sleep per chain request, to mimic a network round trip
+    failures: expirations whose chain request raises, to exercise partial results
+    """
+
+    name = 'static'
+
+    def __init__(self, quotes, chains, latency=0.0, failures=(), histories=None):
+        self.quotes = quotes
+        self.chains = chains
+        self.latency = latency
+        self.failures = set(failures)
+        self.histories = histories or {}
+
+    def get_history(self, symbol, period=None, start=None):
+        return slice_history(self.histories[symbol], period, start).copy()
+
+    def get_histories(self, symbols, period=None, start=None):
+        return {symbol: self.get_history(symbol, period, start) for symbol in symbols if symbol in self.histories}
+
+    def get_quote(self, symbol):
+        return self.quotes[symbol]
+
+    def get_expirations(self, symbol):
+        return sorted(self.chains.get(symbol, {}))
+
+    def get_option_chain(self, symbol, expiration):
+        if self.latency:
+            time.sleep(self.latency)
+        if expiration in self.failures:
+            raise ConnectionError(f"Simulated failure for {symbol} {expiration}")
+        calls, puts = self.chains[symbol][expiration]
+        return calls.copy(), puts.copy()
+
+
+def create_market_data():
+    """
+    Build the provider selected by the environment
+    MARKET_DATA_PROVIDER: yahoo (default), synthetic or replay
+    MARKET_DATA_SEED / MARKET_DATA_LATENCY: synthetic seed and per-call delay in seconds
+    MARKET_DATA_REPLAY_DIR: recorded files for the replay provider
+    MARKET_DATA_RECORD_DIR: when set, every response is also recorded there
+    """
+    name = os.environ.get('MARKET_DATA_PROVIDER', 'yahoo').lower()
+    if name == 'yahoo':
+        provider = YahooMarketData()
+    elif name == 'synthetic':
+        provider = SyntheticMarketData(seed=int(os.environ.get('MARKET_DATA_SEED', 0)),
+                                       latency=float(os.environ.get('MARKET_DATA_LATENCY', 0.0)))
+    elif name == 'replay':
+        provider = ReplayMarketData(os.environ.get('MARKET_DATA_REPLAY_DIR', 'market_data_recordings'))
+    else:
+        raise ValueError(f"Unknown MARKET_DATA_PROVIDER: {name}")
+
+    record_dir = os.environ.get('MARKET_DATA_RECORD_DIR')
+    return RecordingMarketData(provider, record_dir) if record_dir else provider
+
+
+_default_provider = None
+_default_provider_lock = threading.Lock()
+
+
+def default_market_data():
+    """Process-wide provider shared by every app, predictor and engine"""
+    global _default_provider
+    with _default_provider_lock:
+        if _default_provider is None:
+            _default_provider = create_market_data()
+        return _default_provider
@@ -0,0 +1,134 @@
+"""
+Monte Carlo analysis of multi-leg options strategies
+GBM paths are generated in fixed-size chunks of antithetic pairs so memory
+stays flat however many paths are requested; all legs are evaluated
+against each chunk with broadcasting.
+"""
+
+import math
+import time
+
+import numpy as np
+
+from options_pricing import OptionsPricingEngine
+
+# Percentiles reported for the simulated terminal price
+TERMINAL_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+class MonteCarloEngine:
+    """Simulated probability of profit and P&L distribution for option strategies"""
+
+    def __init__(self, pricing_engine=None, chunk_size=20000, histogram_bins=400):
+        self.pricing_engine = pricing_engine or OptionsPricingEngine()
+        self.chunk_size = chunk_size  # Paths held in memory at once
+        self.histogram_bins = histogram_bins
+
+    def simulate_strategy(self, strategy_legs, current_price, time_to_exp, volatility,
+                          n_paths=100000, n_steps=50, time_budget=None, seed=None, rate=None):
+        """
+        Simulate a strategy held to expiration under risk-neutral GBM
+        Stops early once time_budget seconds have elapsed; the result reports
+        how many paths were actually simulated.
+        """
+        if time_to_exp <= 0:
+            raise ValueError("Strategy has expired")
+        if n_paths < 2:
+            raise ValueError("n_paths must be at least 2")
+        if n_steps < 1:
+            raise ValueError("n_steps must be at least 1")
+        rate = self.pricing_engine.risk_free_rate if rate is None else rate
+        leg_arrays = self.pricing_engine.strategy_leg_arrays(strategy_legs, current_price)
+        strikes = leg_arrays[0][~leg_arrays[3]]
+
+        rng = np.random.default_rng(seed)
+        dt = time_to_exp / n_steps
+        drift = (rate - 0.5 * volatility ** 2) * dt
+        diffusion = volatility * math.sqrt(dt)
+
+        # Probability of touch is tracked for every distinct option strike
+        levels = np.unique(strikes)
+        above = levels >= current_price
+
+        # Terminal log-returns are binned into fixed edges so percentiles need no path storage
+        spread = 6 * volatility * math.sqrt(time_to_exp)
+        edges = np.linspace(-spread, spread, self.histogram_bins + 1)
+        histogram = np.zeros(self.histogram_bins + 2)  # Plus under/overflow bins
+
+        pairs = 0
+        pair_sum = pair_sum_sq = 0.0
+        wins = 0
+        win_sum = loss_sum = 0.0
+        touches = np.zeros(len(levels))
+
+        start = time.perf_counter()
+        half_chunk = max(1, self.chunk_size // 2)
+        total_pairs = math.ceil(n_paths / 2)
+        while pairs < total_pairs:
+            if time_budget is not None and pairs and time.perf_counter() - start > time_budget:
+                break
+
+            batch = min(half_chunk, total_pairs - pairs)
+            shocks = rng.standard_normal((batch, n_steps))
+            shocks = np.concatenate([shocks, -shocks])  # Antithetic pairs: row i and row i + batch
+            log_paths = np.cumsum(drift + diffusion * shocks, axis=1)
+
+            log_return = log_paths[:, -1]
+            terminal = current_price * np.exp(log_return)
+
+            # Legs x paths payoff matrix, summed over legs
+            pnl = self.pricing_engine.strategy_pnl_matrix(leg_arrays, terminal).sum(axis=0)
+
+            pair_pnl = 0.5 * (pnl[:batch] + pnl[batch:])
+            pair_sum += pair_pnl.sum()
+            pair_sum_sq += (pair_pnl ** 2).sum()
+            pairs += batch
+
+            winners = pnl > 0
+            wins += int(winners.sum())
+            win_sum += pnl[winners].sum()
+            loss_sum += pnl[~winners].sum()
+
+            path_high = current_price * np.exp(np.maximum(log_paths.max(axis=1), 0.0))
+            path_low = current_price * np.exp(np.minimum(log_paths.min(axis=1), 0.0))
+            touched = np.where(above, path_high[:, np.newaxis] >= levels, path_low[:, np.newaxis] <= levels)
+            touches += touched.sum(axis=0)
+
+            histogram += np.bincount(np.searchsorted(edges, log_return), minlength=len(histogram))
+
+        n_simulated = 2 * pairs
+        expected_pnl = pair_sum / pairs
+        pair_variance = max(pair_sum_sq / pairs - expected_pnl ** 2, 0.0)
+        losses = n_simulated - wins
+
+        # Percentiles from the cumulative histogram, at bin upper edges
+        cumulative = np.cumsum(histogram) / n_simulated
+        upper_edges = np.concatenate([[edges[0]], edges[1:], [edges[-1]]])
+        terminal_percentiles = {
+            f"p{pct}": round(float(current_price * np.exp(upper_edges[np.searchsorted(cumulative, pct / 100)])), 2)
+            for pct in TERMINAL_PERCENTILES
+        }
+
+        return {
+            'mode': 'monte_carlo',
+            'pathsRequested': n_paths,
+            'pathsSimulated': n_simulated,
+            'truncatedByTimeBudget': n_simulated < 2 * total_pairs,
+            'elapsedSeconds': round(time.perf_counter() - start, 4),
+            'probabilityOfProfit': round(wins / n_simulated, 4),
+            'expectedPnL': round(float(expected_pnl), 2),
+            'standardError': round(float(math.sqrt(pair_variance / pairs)), 4),
+            'averageProfit': round(float(win_sum / wins), 2) if wins else 0.0,
+            'averageLoss': round(float(loss_sum / losses), 2) if losses else 0.0,
+            'probabilityOfTouch': {f"{level:g}": round(float(count / n_simulated), 4)
+                                   for level, count in zip(levels, touches)},
+            'terminalPricePercentiles': terminal_percentiles,
+            'parameters': {
+                'currentPrice': current_price,
+                'timeToExpiration': time_to_exp,
+                'volatility': volatility,
+                'riskFreeRate': rate,
+                'steps': n_steps,
+                'seed': seed
+            }
+        }
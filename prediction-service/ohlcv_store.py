@@ -0,0 +1,443 @@
+"""
+Local OHLCV history store shared by every fetch_data path
+Each symbol is stored column-wise: a (fields, rows) float array with one
+contiguous row per field, a separate int64 date array (both .npy files,
+memory-mapped on read) and a small JSON meta file naming the current file
+version. Reading one field only pages in that field. Requests for any period
+are sliced from the local bars; only bars from the last stored date onwards
+are downloaded and appended, and a new file version is written and switched
+to atomically through the meta file.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from market_data import default_market_data, period_start, slice_history
+from single_flight import upstream_flights
+
+BAR_FIELDS = ('Open', 'High', 'Low', 'Close', 'Volume', 'Dividends', 'Stock Splits')
+ALL_HISTORY = int(np.iinfo(np.int64).min)  # Coverage start recorded after a 'max' download
+
+BULK_CHUNK_SIZE = 20  # Symbols per grouped upstream download
+
+# How far after a period's start the first bar of a full download may fall (weekends, holidays, closures)
+COVERAGE_SLACK_NS = 10 * 24 * 3600 * 10 ** 9
+
+DEFAULT_STORE_DIR = os.environ.get('OHLCV_STORE_DIR', os.path.join(os.path.dirname(__file__), 'ohlcv_data'))
+
+
+def covers_period(loaded, period):
+    """Whether bars loaded for one period include every bar of another"""
+    start, loaded_start = period_start(period), period_start(loaded)
+    return loaded_start is None or (start is not None and start >= loaded_start)
+
+
+class Bars:
+    """Daily bars with one contiguous array per field: dates (rows,) in UTC epoch ns, values (fields, rows)"""
+
+    __slots__ = ('dates', 'values')
+
+    def __init__(self, dates, values):
+        self.dates = dates
+        self.values = values
+
+    def __len__(self):
+        return len(self.dates)
+
+    def __getitem__(self, rows):
+        return Bars(self.dates[rows], self.values[:, rows])
+
+    def column(self, name):
+        return self.values[BAR_FIELDS.index(name)]
+
+
+class OHLCVStore:
+    """Daily bars per symbol on local disk with incremental refresh"""
+
+    def __init__(self, root=DEFAULT_STORE_DIR, fetcher=None, refresh_seconds=300, flights=upstream_flights,
+                 bulk_fetcher=None, chunk_size=BULK_CHUNK_SIZE):
+        self.root = root
+        # fetcher(symbol, period=None, start=None) -> DataFrame like Ticker.history
+        self.fetcher = fetcher or default_market_data().get_history
+        # bulk_fetcher(symbols, period=None, start=None) -> {symbol: DataFrame}, one upstream request per call
+        self.bulk_fetcher = bulk_fetcher or default_market_data().get_histories
+        self.chunk_size = chunk_size
+        self.refresh_seconds = refresh_seconds  # How long stored bars count as current
+        self.flights = flights  # Concurrent refreshes of one (symbol, period) share a single download
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _meta_path(self, symbol):
+        return os.path.join(self.root, f"{symbol}.json")
+
+    def _column_paths(self, symbol, version):
+        """(dates, values) file paths of one stored version"""
+        return tuple(os.path.join(self.root, f"{symbol}.{version}.{part}.npy") for part in ('dates', 'values'))
+
+    def _lock(self, symbol):
+        with self._locks_guard:
+            return self._locks.setdefault(symbol, threading.Lock())
+
+    def _read(self, symbol):
+        """(memory-mapped Bars, meta) or (None, None) when nothing is stored"""
+        meta_path = self._meta_path(symbol)
+        for _ in range(3):
+            if not os.path.exists(meta_path):
+                return None, None
+            with open(meta_path) as handle:
+                meta = json.load(handle)
+            if 'version' not in meta:
+                return None, None  # Written by the old row-interleaved layout; downloaded again
+            try:
+                dates_path, values_path = self._column_paths(symbol, meta['version'])
+                return Bars(np.load(dates_path, mmap_mode='r'), np.load(values_path, mmap_mode='r')), meta
+            except FileNotFoundError:
+                continue  # A writer switched versions between reading meta and the files
+        raise RuntimeError(f"Stored history for {symbol} kept changing while being read")
+
+    def _write(self, symbol, bars, meta):
+        """
+        Write a new version of the column files, then switch to it by replacing the meta file
+        Each file is written to a temp path and renamed, and readers only follow
+        the meta file, so they never see a partly written version.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        meta_path = self._meta_path(symbol)
+        previous = None
+        if os.path.exists(meta_path):
+            with open(meta_path) as handle:
+                previous = json.load(handle).get('version')
+        meta = dict(meta, version=(previous or 0) + 1)
+
+        dates_path, values_path = self._column_paths(symbol, meta['version'])
+        for path, write in ((dates_path, lambda handle: np.save(handle, np.ascontiguousarray(bars.dates))),
+                            (values_path, lambda handle: np.save(handle, np.ascontiguousarray(bars.values))),
+                            (meta_path, lambda handle: handle.write(json.dumps(meta).encode()))):
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'wb') as handle:
+                write(handle)
+            os.replace(temp_path, path)
+
+        # Files of the replaced version (and of the old single-file layout) are no longer referenced
+        stale = self._column_paths(symbol, previous) if previous else (os.path.join(self.root, f"{symbol}.npy"),)
+        for path in stale:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        return meta
+
+    def _to_bars(self, frame):
+        index = pd.DatetimeIndex(frame.index)
+        index = index.tz_convert('UTC') if index.tz is not None else index.tz_localize('UTC')
+        values = np.zeros((len(BAR_FIELDS), len(frame)))
+        for row, name in enumerate(BAR_FIELDS):
+            if name in frame:
+                values[row] = frame[name].to_numpy(dtype=float)
+        return Bars(index.as_unit('ns').asi8.copy(), values)
+
+    def _to_frame(self, bars, timezone):
+        # Each column is copied out of its own contiguous field row
+        frame = pd.DataFrame({name: np.array(bars.column(name)) for name in BAR_FIELDS},
+                             index=pd.DatetimeIndex(pd.to_datetime(np.array(bars.dates), unit='ns', utc=True),
+                                                    name='Date'))
+        frame['Volume'] = frame['Volume'].astype(np.int64)
+        if timezone:
+            frame.index = frame.index.tz_convert(timezone)
+        return frame
+
+    def _merge(self, bars, new_bars):
+        """Stored bars before the first new bar, followed by the new bars"""
+        if bars is None or not len(bars):
+            return new_bars
+        keep = np.searchsorted(bars.dates, new_bars.dates[0]) if len(new_bars) else len(bars)
+        return Bars(np.concatenate([bars.dates[:keep], new_bars.dates]),
+                    np.concatenate([bars.values[:, :keep], new_bars.values], axis=1))
+
+    def _timezone(self, frame, meta):
+        index = pd.DatetimeIndex(frame.index)
+        return str(index.tz) if index.tz is not None else (meta or {}).get('timezone')
+
+    def _reaches_back(self, frame, bars, start_ns):
+        """
+        Whether a full download really covers from start_ns
+        yfinance reports a failed or throttled request as an empty frame, so
+        coverage is only widened when the first fetched bar is near the period
+        start or no later than the first stored bar (the symbol has no older
+        history upstream).
+        """
+        if frame.empty:
+            return False
+        first = self._to_bars(frame.iloc[:1]).dates[0]
+        return first <= start_ns + COVERAGE_SLACK_NS or (bars is not None and len(bars) > 0 and first <= bars.dates[0])
+
+    def _has_adjustment(self, frame, bars):
+        """Whether fetched bars after the last stored one include a split or dividend"""
+        index = pd.DatetimeIndex(frame.index)
+        index = index.tz_convert('UTC') if index.tz is not None else index.tz_localize('UTC')
+        after = index.as_unit('ns').asi8 > bars.dates[-1]
+        return any(name in frame and bool((frame[name].to_numpy(dtype=float)[after] != 0).any())
+                   for name in ('Dividends', 'Stock Splits'))
+
+    def _redownload(self, symbol, meta, now):
+        """
+        Replace the stored bars with a fresh download of the whole covered window
+        Fetched bars are split- and dividend-adjusted, so a new event changes
+        every earlier bar; appending to the old basis would leave a jump.
+        Caller holds the symbol lock.
+        """
+        if meta['coveredFrom'] == ALL_HISTORY:
+            frame = self.fetcher(symbol, period='max')
+        else:
+            covered = pd.Timestamp(meta['coveredFrom'], tz='UTC')
+            frame = self.fetcher(symbol, start=covered.strftime('%Y-%m-%d'))
+        if frame.empty:
+            raise ValueError(f"Re-download of {symbol} history returned no bars")
+        return self._store_fetched(symbol, None, meta, frame, meta['coveredFrom'], now)
+
+    def refresh(self, symbol, period='1y'):
+        """
+        Make the stored bars cover `period` and be current, fetching as little as possible
+        A period reaching back before what is stored is downloaded in full once;
+        otherwise only bars from the last stored date onwards are requested (the
+        last bar is re-fetched because it may have been an intraday snapshot).
+        A split or dividend in those bars triggers a full re-download instead.
+        """
+        symbol = symbol.upper()
+        start = period_start(period)
+        start_ns = ALL_HISTORY if start is None else start.as_unit('ns').value
+        with self._lock(symbol):
+            bars, meta = self._read(symbol)
+            now = time.time()
+            covered = meta is not None and meta['coveredFrom'] <= start_ns
+            if covered and now - meta['checkedAt'] < self.refresh_seconds:
+                return bars, meta
+
+            if covered and len(bars):
+                last_date = pd.Timestamp(int(bars.dates[-1]), tz='UTC').tz_convert(meta['timezone'] or 'UTC')
+                frame = self.fetcher(symbol, start=last_date.strftime('%Y-%m-%d'))
+                if self._has_adjustment(frame, bars):
+                    return self._redownload(symbol, meta, now)
+                covered_from = meta['coveredFrom']
+            else:
+                frame = self.fetcher(symbol, period=period)
+                if frame.empty and meta is None:
+                    return None, None
+                if meta is not None and not self._reaches_back(frame, bars, start_ns):
+                    print(f"History download for {symbol} ({period}) came back short, keeping stored coverage")
+                    return bars, meta
+                covered_from = start_ns if meta is None else min(meta['coveredFrom'], start_ns)
+            return self._store_fetched(symbol, bars, meta, frame, covered_from, now)
+
+    def _store_fetched(self, symbol, bars, meta, frame, covered_from, now):
+        """Merge freshly fetched bars into the stored ones and write both files; caller holds the symbol lock"""
+        merged = self._merge(bars, self._to_bars(frame))
+        meta = {
+            'symbol': symbol,
+            'timezone': self._timezone(frame, meta),
+            'coveredFrom': int(covered_from),
+            'checkedAt': now,
+            'rows': int(len(merged)),
+            'fetchedRows': int(len(frame))
+        }
+        self._write(symbol, merged, meta)
+        return self._read(symbol)
+
+    def preload(self, symbols, period='1y'):
+        """
+        Bring many symbols up to date with grouped downloads and return them as a HistoryPanel
+        Symbols needing a full download and symbols needing only recent bars are
+        fetched in separate groups of at most chunk_size symbols per upstream
+        request. Symbols a bulk request fails for are left to the per-symbol
+        refresh when the panel is built. A recent-bar symbol with a new split or
+        dividend is re-downloaded on its own (see _redownload).
+        """
+        symbols = sorted({symbol.upper() for symbol in symbols})
+        start = period_start(period)
+        start_ns = ALL_HISTORY if start is None else start.as_unit('ns').value
+        now = time.time()
+
+        full, recent = [], {}
+        loaded = set()  # Symbols whose stored bars are current without another fetch
+        for symbol in symbols:
+            bars, meta = self._read(symbol)
+            covered = meta is not None and meta['coveredFrom'] <= start_ns
+            if covered and now - meta['checkedAt'] < self.refresh_seconds:
+                loaded.add(symbol)
+                continue
+            if covered and len(bars):
+                last_date = pd.Timestamp(int(bars.dates[-1]), tz='UTC').tz_convert(meta['timezone'] or 'UTC')
+                recent[symbol] = last_date.strftime('%Y-%m-%d')
+            else:
+                full.append(symbol)
+
+        # Recent-bar symbols are grouped by their last stored date so a stale symbol does not widen the others' window
+        groups = [(full, {'period': period})]
+        by_start = defaultdict(list)
+        for symbol, last_date in recent.items():
+            by_start[last_date].append(symbol)
+        groups.extend((sorted(group), {'start': last_date}) for last_date, group in sorted(by_start.items()))
+        requests = 0
+        for group, fetch_args in groups:
+            for first in range(0, len(group), self.chunk_size):
+                chunk = group[first:first + self.chunk_size]
+                requests += 1
+                try:
+                    frames = self.bulk_fetcher(chunk, **fetch_args)
+                except Exception as e:
+                    print(f"Bulk history download failed for {', '.join(chunk)}: {e}")
+                    continue
+                for symbol in chunk:
+                    frame = frames.get(symbol)
+                    if frame is None or frame.empty:
+                        continue
+                    with self._lock(symbol):
+                        bars, meta = self._read(symbol)
+                        if 'start' in fetch_args and len(bars) and self._has_adjustment(frame, bars):
+                            try:
+                                self._redownload(symbol, meta, now)
+                            except Exception as e:
+                                print(f"History re-download failed for {symbol}: {e}")
+                                continue
+                        elif 'start' in fetch_args:
+                            self._store_fetched(symbol, bars, meta, frame, meta['coveredFrom'], now)
+                        elif meta is None or self._reaches_back(frame, bars, start_ns):
+                            covered_from = start_ns if meta is None else min(meta['coveredFrom'], start_ns)
+                            self._store_fetched(symbol, bars, meta, frame, covered_from, now)
+                        else:
+                            print(f"Bulk history download for {symbol} came back short, keeping stored coverage")
+                    loaded.add(symbol)
+
+        print(f"Preloaded history for {len(symbols)} symbol(s) with {requests} bulk request(s)")
+        frames = {symbol: self._window(*self._read(symbol), period) if symbol in loaded
+                  else self.get_history(symbol, period) for symbol in symbols}
+        return HistoryPanel(frames, period, self)
+
+    def get_history(self, symbol, period='1y'):
+        """
+        Daily bars for a yfinance-style period as a Ticker.history-like DataFrame
+        Falls back to whatever is stored if the upstream refresh fails; returns
+        an empty DataFrame when there is no data at all.
+        """
+        symbol = symbol.upper()
+        try:
+            (bars, meta), _ = self.flights.do((symbol, 'history', period), lambda: self.refresh(symbol, period))
+        except Exception as e:
+            print(f"History refresh failed for {symbol}, using stored bars: {e}")
+            bars, meta = self._read(symbol)
+        return self._window(bars, meta, period)
+
+    def _window(self, bars, meta, period):
+        """Stored bars inside a period as a DataFrame; empty when nothing is stored"""
+        if bars is None:
+            return pd.DataFrame(columns=list(BAR_FIELDS))
+
+        # Only the requested window is copied out of the memory map
+        start = period_start(period)
+        first = 0 if start is None else int(np.searchsorted(bars.dates, start.as_unit('ns').value))
+        return self._to_frame(bars[first:], meta['timezone'])
+
+
+def _default_store():
+    """Store fed by the configured market data provider, in a directory of its own so sources never mix"""
+    provider = default_market_data()
+    return OHLCVStore(root=os.path.join(DEFAULT_STORE_DIR, provider.name), fetcher=provider.get_history,
+                      bulk_fetcher=provider.get_histories)
+
+
+# Shared by every predictor and app in the process
+history_store = _default_store()
+
+
+def get_history(symbol, period='1y'):
+    """Daily bars for a symbol from the shared local store"""
+    return history_store.get_history(symbol, period)
+
+
+class HistoryPanel:
+    """
+    Daily bars for a batch of symbols held in memory (see OHLCVStore.preload)
+    get_history reads like the module-level get_history; symbols or periods
+    the panel does not hold fall through to the store.
+    """
+
+    def __init__(self, frames, period, store):
+        self.frames = frames  # {symbol: DataFrame}
+        self.period = period
+        self.store = store
+
+    def get_history(self, symbol, period='1y'):
+        symbol = symbol.upper()
+        frame = self.frames.get(symbol)
+        if frame is None or frame.empty or not covers_period(self.period, period):
+            return self.store.get_history(symbol, period)
+        return slice_history(frame, period).copy()
+
+
+class HistoryContext:
+    """
+    Market data for one prediction run
+    The longest window is loaded once; shorter windows and their derived
+    frames (e.g. technical indicators) are sliced from it in memory. Stage
+    timings and the number of windows that needed no fetch are recorded so a
+    run can report the download time it saved.
+    """
+
+    def __init__(self, symbol, period='5y', loader=get_history):
+        self.symbol = symbol.upper()
+        self.period = period
+        self.loader = loader
+        self.timings = {}  # Stage name -> seconds
+        self.fetches = 0
+        self.sliced = 0  # Windows served from memory instead of a fetch
+        self._frame = None
+        self._derived = {}
+
+    def timed(self, stage, func, *args, **kwargs):
+        """Run func and add its wall time to a stage"""
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.timings[stage] = self.timings.get(stage, 0.0) + time.perf_counter() - start
+
+    def _covers(self, period):
+        return covers_period(self.period, period)
+
+    def history(self, period=None):
+        """Daily bars for a period, fetched only the first time or when it reaches back further than loaded"""
+        period = period or self.period
+        if self._frame is None or not self._covers(period):
+            if not self._covers(period):
+                self.period = period
+            self._frame = self.timed('fetch', self.loader, self.symbol, self.period)
+            self._derived = {}
+            self.fetches += 1
+        else:
+            self.sliced += 1
+        return self._frame if period == self.period else slice_history(self._frame, period)
+
+    def derived(self, name, build, period=None):
+        """A frame built once from the full history (e.g. indicators), sliced to a period"""
+        if self._frame is None or (period is not None and not self._covers(period)):
+            self.history(period)
+        if name not in self._derived:
+            self._derived[name] = self.timed(name, build, self._frame)
+        frame = self._derived[name]
+        if period is None or period == self.period:
+            return frame
+        self.sliced += 1
+        return slice_history(frame, period)
+
+    def summary(self):
+        """One line of per-stage timings and the estimated fetch time saved by slicing"""
+        stages = ', '.join(f"{stage} {seconds:.2f}s" for stage, seconds in self.timings.items())
+        per_fetch = self.timings.get('fetch', 0.0) / max(self.fetches, 1)
+        return (f"{self.symbol} timings: {stages}; {self.fetches} fetch(es), {self.sliced} window(s) "
+                f"sliced in memory, saving ~{per_fetch * self.sliced:.2f}s of fetches")
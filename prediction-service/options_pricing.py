@@ -1,34 +1,71 @@
 import numpy as np
 import pandas as pd
-import yfinance as yf
-from scipy.stats import norm
-from scipy.optimize import brentq
-import math
-from datetime import datetime, timedelta
+from scipy.special import ndtr
+import io
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
 import warnings
 warnings.filterwarnings('ignore')
 
+from market_data import default_market_data
+from svi import SVISmile
+
+# Columns produced by OptionsPricingEngine.calculate_greeks_batch
+GREEK_FIELDS = ('price', 'delta', 'gamma', 'theta', 'vega', 'rho')
+
+# Implied volatility search range and fallback when no solution exists
+IV_LOWER_BOUND = 0.001
+IV_UPPER_BOUND = 5.0
+DEFAULT_VOLATILITY = 0.20
+
+# Per-contract fields of /options-chain responses, in serialization order
+CHAIN_FIELDS = (
+    'strike', 'lastPrice', 'bid', 'ask', 'volume', 'openInterest', 'impliedVolatility',
+    'theoreticalPrice', 'delta', 'gamma', 'theta', 'vega', 'rho', 'inTheMoney'
+)
+
+# Chain columns derived from the pricing model, reusable across refreshes
+MODEL_FIELDS = ('impliedVolatility', 'ivConverged', 'theoreticalPrice') + GREEK_FIELDS[1:]
+
 class OptionsPricingEngine:
-    def __init__(self):
+    def __init__(self, provider=None, max_workers=4, expiration_timeout=15.0, max_expirations=6,
+                 reprice_spot_threshold=0.0025):
         self.risk_free_rate = 0.05  # 5% risk-free rate (10-year Treasury)
+        self.provider = provider or default_market_data()
+        self.max_workers = max_workers  # Concurrent expiration fetches; 1 means serial
+        self.expiration_timeout = expiration_timeout  # Seconds per expiration fetch, from when it starts
+        # Shared by every load_expirations call, so hung upstream requests never hold more than max_workers threads
+        self._fetch_executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='options-fetch')
+        self.max_expirations = max_expirations
+        # Relative spot move since a chain was priced that forces a full reprice on refresh
+        self.reprice_spot_threshold = reprice_spot_threshold
     
-    def safe_float(self, value, default=0.0):
-        """Safely convert value to float, handling NaN and None"""
-        if value is None or pd.isna(value) or np.isnan(float(value)) if isinstance(value, (int, float)) else False:
-            return default
-        try:
-            return float(value)
-        except (ValueError, TypeError):
-            return default
+    def _is_call(self, option_type):
+        """Boolean call mask from 'call'/'put' labels or an existing boolean mask"""
+        option_type = np.asarray(option_type)
+        if option_type.dtype == bool:
+            return option_type
+        return option_type == 'call'
     
-    def safe_int(self, value, default=0):
-        """Safely convert value to int, handling NaN and None"""
-        if value is None or pd.isna(value) or (isinstance(value, float) and np.isnan(value)):
-            return default
-        try:
-            return int(value)
-        except (ValueError, TypeError):
-            return default
+    def _d1_d2(self, S, K, T, r, sigma):
+        """Compute Black-Scholes d1/d2 and sqrt(T) for broadcast arrays of contracts"""
+        sqrt_t = np.sqrt(np.maximum(T, 0.0))
+        vol_sqrt_t = sigma * sqrt_t
+        with np.errstate(divide='ignore', invalid='ignore'):
+            d1 = (np.log(S / K) + (r + 0.5 * sigma ** 2) * T) / vol_sqrt_t
+        d2 = d1 - vol_sqrt_t
+        return d1, d2, sqrt_t
+    
+    def black_scholes_price(self, S, K, T, r, sigma, option_type='call'):
+        """
+        Vectorized Black-Scholes price for arrays of contracts
+        S, K, T, r, sigma: scalars or NumPy arrays (broadcast together)
+        option_type: 'call', 'put', an array of those, or a boolean call mask
+        Contracts with T <= 0 are valued at intrinsic value.
+        """
+        return self.calculate_greeks_batch(S, K, T, r, sigma, option_type, fields=('price',))['price']
     
     def black_scholes_call(self, S, K, T, r, sigma):
         """
@@ -39,260 +76,760 @@ class OptionsPricingEngine:
         r: Risk-free rate
         sigma: Volatility
         """
-        if T <= 0:
-            return max(S - K, 0)
-        
-        d1 = (np.log(S / K) + (r + 0.5 * sigma ** 2) * T) / (sigma * np.sqrt(T))
-        d2 = d1 - sigma * np.sqrt(T)
-        
-        call_price = S * norm.cdf(d1) - K * np.exp(-r * T) * norm.cdf(d2)
-        return max(call_price, 0)
+        return float(self.black_scholes_price(S, K, T, r, sigma, 'call'))
     
     def black_scholes_put(self, S, K, T, r, sigma):
         """Calculate Black-Scholes put option price"""
-        if T <= 0:
-            return max(K - S, 0)
+        return float(self.black_scholes_price(S, K, T, r, sigma, 'put'))
+    
+    def calculate_greeks_batch(self, S, K, T, r, sigma, option_type='call', fields=GREEK_FIELDS):
+        """
+        Vectorized price and Greeks for arrays of contracts
+        Shared terms (N(d1), N(d2), pdf(d1), discount factor) are computed once
+        and only when a requested field needs them; each row is priced for its
+        own side only. fields: subset of GREEK_FIELDS to return.
+        Returns a dict of arrays keyed by field name (theta per day, vega and rho per 1%).
+        """
+        unknown = set(fields) - set(GREEK_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown Greek fields: {sorted(unknown)}")
         
-        d1 = (np.log(S / K) + (r + 0.5 * sigma ** 2) * T) / (sigma * np.sqrt(T))
-        d2 = d1 - sigma * np.sqrt(T)
+        S, K, T, r, sigma = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (S, K, T, r, sigma)))
+        is_call = np.broadcast_to(self._is_call(option_type), S.shape)
+        live = T > 0
         
-        put_price = K * np.exp(-r * T) * norm.cdf(-d2) - S * norm.cdf(-d1)
-        return max(put_price, 0)
+        d1, d2, sqrt_t = self._d1_d2(S, K, T, r, sigma)
+        # Signed N(d1) / N(d2): N(d) for calls, -N(-d) = N(d) - 1 for puts. One ndtr call per term on the
+        # reflected argument, which keeps deep out-of-the-money puts as accurate as 1 - N(d) cannot
+        sign = 2.0 * is_call - 1.0
+        signed_nd1 = sign * ndtr(sign * d1) if {'price', 'delta'} & set(fields) else None
+        signed_nd2 = sign * ndtr(sign * d2) if {'price', 'theta', 'rho'} & set(fields) else None
+        pdf_d1 = np.exp(-0.5 * d1 ** 2) / np.sqrt(2 * np.pi) if {'gamma', 'theta', 'vega'} & set(fields) else None
+        discounted_strike = K * np.exp(-r * T) if signed_nd2 is not None else None
+        
+        result = {}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if 'price' in fields:
+                # S N(d1) - K e^-rT N(d2) for calls, K e^-rT N(-d2) - S N(-d1) for puts
+                price = S * signed_nd1 - discounted_strike * signed_nd2
+                if not live.all():
+                    price = np.where(live, price, np.where(is_call, S - K, K - S))
+                result['price'] = np.maximum(price, 0.0)
+            
+            if 'delta' in fields:
+                expired_delta = np.where(is_call, np.where(S > K, 1.0, 0.0), np.where(S < K, -1.0, 0.0))
+                result['delta'] = np.where(live, signed_nd1, expired_delta)
+            
+            if 'gamma' in fields:
+                result['gamma'] = np.where(live, pdf_d1 / (S * sigma * sqrt_t), 0.0)
+            
+            if 'theta' in fields:
+                common_theta = -(S * pdf_d1 * sigma) / (2 * sqrt_t)
+                theta = (common_theta - r * discounted_strike * signed_nd2) / 365
+                result['theta'] = np.where(live, theta, 0.0)
+            
+            if 'vega' in fields:
+                result['vega'] = np.where(live, S * pdf_d1 * sqrt_t / 100, 0.0)
+            
+            if 'rho' in fields:
+                result['rho'] = np.where(live, discounted_strike * T * signed_nd2 / 100, 0.0)
+        
+        return result
     
     def calculate_greeks(self, S, K, T, r, sigma, option_type='call'):
         """Calculate all Greeks for an option"""
-        if T <= 0:
-            return {
-                'delta': 1.0 if option_type == 'call' and S > K else 0.0,
-                'gamma': 0.0, 'theta': 0.0, 'vega': 0.0, 'rho': 0.0
-            }
+        greeks = self.calculate_greeks_batch(S, K, T, r, sigma, option_type, fields=GREEK_FIELDS[1:])
+        return {name: round(float(value), 4) for name, value in greeks.items()}
+    
+    def american_option_price(self, S, K, T, r, sigma, option_type='call', steps=200):
+        """
+        Price American options on a Cox-Ross-Rubinstein binomial lattice
+        Inputs broadcast to a 1-D vector of contracts (e.g. a strike grid); every
+        contract gets its own lattice and the backward induction runs across all
+        contracts and nodes at once, one vectorized step per time step.
+        """
+        S, K, T, r, sigma, is_call = np.broadcast_arrays(
+            *(np.atleast_1d(np.asarray(x, dtype=float)) for x in (S, K, T, r, sigma)),
+            np.atleast_1d(self._is_call(option_type))
+        )
+        S, K, T, r, sigma, is_call = (x.ravel()[:, np.newaxis] for x in (S, K, T, r, sigma, is_call))
         
-        d1 = (np.log(S / K) + (r + 0.5 * sigma ** 2) * T) / (sigma * np.sqrt(T))
-        d2 = d1 - sigma * np.sqrt(T)
+        dt = np.maximum(T, 0.0) / steps
+        log_up = sigma * np.sqrt(dt)
+        up = np.exp(log_up)
+        growth = np.exp(r * dt)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            p_up = np.clip((growth - 1 / up) / (up - 1 / up), 0.0, 1.0)
+        discount = 1 / growth
+        # Node j at a given step has spot S * u^(2j - step); precompute S * u^k for k in [-steps, steps]
+        spot_grid = S * np.exp(np.arange(-steps, steps + 1) * log_up)
+        exercise_grid = np.maximum(np.where(is_call, spot_grid - K, K - spot_grid), 0.0)
         
-        # Delta
-        if option_type == 'call':
-            delta = norm.cdf(d1)
-        else:
-            delta = norm.cdf(d1) - 1
+        def exercise_value(step):
+            return exercise_grid[:, steps - step:steps + step + 1:2]
         
-        # Gamma (same for calls and puts)
-        gamma = norm.pdf(d1) / (S * sigma * np.sqrt(T))
+        values = exercise_value(steps)
+        for step in range(steps - 1, -1, -1):
+            continuation = discount * (p_up * values[:, 1:] + (1 - p_up) * values[:, :-1])
+            values = np.maximum(continuation, exercise_value(step))
         
-        # Theta
-        common_theta = -(S * norm.pdf(d1) * sigma) / (2 * np.sqrt(T))
-        if option_type == 'call':
-            theta = (common_theta - r * K * np.exp(-r * T) * norm.cdf(d2)) / 365
-        else:
-            theta = (common_theta + r * K * np.exp(-r * T) * norm.cdf(-d2)) / 365
+        price = values[:, 0]
+        intrinsic = np.maximum(np.where(is_call, S - K, K - S), 0.0)[:, 0]
         
-        # Vega (same for calls and puts)
-        vega = S * norm.pdf(d1) * np.sqrt(T) / 100
+        # Zero volatility or a vanishing tenor makes u == d and p_up undefined; the spot path is then
+        # deterministic, so the value is the better of exercising now or at expiry on the forward
+        strike_pv = K * np.exp(-r * np.maximum(T, 0.0))
+        forward = np.maximum(np.where(is_call, S - strike_pv, strike_pv - S), 0.0)[:, 0]
+        degenerate = log_up[:, 0] < 1e-8
+        price = np.where(degenerate, np.maximum(intrinsic, forward), price)
+        return np.where(T[:, 0] > 0, price, intrinsic)
+    
+    def implied_volatility_batch(self, market_price, S, K, T, r, option_type='call',
+                                 tol=1e-6, max_newton_iter=8, max_bisect_iter=60):
+        """
+        Vectorized implied volatility for arrays of contracts
+        Newton iterations on vega from a Corrado-Miller initial guess, with
+        vectorized bisection on [IV_LOWER_BOUND, IV_UPPER_BOUND] for contracts
+        that do not converge.
+        Returns (iv, converged); iv is NaN where no solution was found.
+        """
+        market_price, S, K, T, r, is_call = np.broadcast_arrays(
+            *(np.asarray(x, dtype=float) for x in (market_price, S, K, T, r)),
+            self._is_call(option_type)
+        )
+        shape = S.shape
+        market_price, S, K, T, r, is_call = (x.ravel() for x in (market_price, S, K, T, r, is_call))
         
-        # Rho
-        if option_type == 'call':
-            rho = K * T * np.exp(-r * T) * norm.cdf(d2) / 100
-        else:
-            rho = -K * T * np.exp(-r * T) * norm.cdf(-d2) / 100
+        # Prices outside the no-arbitrage bounds have no implied volatility
+        discounted_strike = K * np.exp(-r * T)
+        lower_bound = np.maximum(np.where(is_call, S - discounted_strike, discounted_strike - S), 0.0)
+        upper_bound = np.where(is_call, S, discounted_strike)
+        solvable = (T > 0) & (market_price > lower_bound) & (market_price < upper_bound)
         
-        return {
-            'delta': round(delta, 4),
-            'gamma': round(gamma, 4),
-            'theta': round(theta, 4),
-            'vega': round(vega, 4),
-            'rho': round(rho, 4)
-        }
+        # Corrado-Miller closed-form guess, using put-call parity for puts
+        call_price = np.where(is_call, market_price, market_price + S - discounted_strike)
+        half_moneyness = 0.5 * (S - discounted_strike)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            radicand = np.maximum((call_price - half_moneyness) ** 2 - (S - discounted_strike) ** 2 / np.pi, 0.0)
+            guess = (np.sqrt(2 * np.pi / T) / (S + discounted_strike)
+                     * (call_price - half_moneyness + np.sqrt(radicand)))
+        sigma = np.clip(np.nan_to_num(guess, nan=0.3), 0.05, 3.0)
+        
+        converged = np.zeros(S.shape, dtype=bool)
+        for _ in range(max_newton_iter):
+            active = solvable & ~converged
+            if not active.any():
+                break
+            greeks = self.calculate_greeks_batch(S[active], K[active], T[active], r[active], sigma[active],
+                                                 is_call[active], fields=('price', 'vega'))
+            diff = greeks['price'] - market_price[active]
+            vega = greeks['vega'] * 100  # per unit of volatility
+            # Flat-vega contracts are left for the bisection fallback
+            usable = vega > 1e-8
+            with np.errstate(divide='ignore', invalid='ignore'):
+                step = np.where(usable, diff / vega, 0.0)
+            sigma[active] = np.clip(sigma[active] - step, IV_LOWER_BOUND, IV_UPPER_BOUND)
+            converged[active] = usable & (np.abs(step) < tol)
+        
+        # Bisection fallback for contracts Newton could not settle
+        pending = solvable & ~converged
+        if pending.any():
+            args = (S[pending], K[pending], T[pending], r[pending])
+            pending_calls = is_call[pending]
+            target = market_price[pending]
+            lo = np.full(target.shape, IV_LOWER_BOUND)
+            hi = np.full(target.shape, IV_UPPER_BOUND)
+            bracketed = ((self.black_scholes_price(*args, lo, pending_calls) - target)
+                         * (self.black_scholes_price(*args, hi, pending_calls) - target)) <= 0
+            for _ in range(max_bisect_iter):
+                mid = 0.5 * (lo + hi)
+                above = self.black_scholes_price(*args, mid, pending_calls) > target
+                hi = np.where(above, mid, hi)
+                lo = np.where(above, lo, mid)
+                if np.all(hi - lo < tol):
+                    break
+            sigma[pending] = 0.5 * (lo + hi)
+            converged[pending] = bracketed & (hi - lo < tol)
+        
+        iv = np.where(converged, sigma, np.nan)
+        return iv.reshape(shape), converged.reshape(shape)
     
     def implied_volatility(self, market_price, S, K, T, r, option_type='call'):
-        """Calculate implied volatility using Brent's method"""
+        """Calculate implied volatility, defaulting to 20% if no solution is found"""
         if T <= 0:
             return 0.0
         
-        def objective_function(sigma):
-            if option_type == 'call':
-                theoretical_price = self.black_scholes_call(S, K, T, r, sigma)
-            else:
-                theoretical_price = self.black_scholes_put(S, K, T, r, sigma)
-            return theoretical_price - market_price
+        iv, converged = self.implied_volatility_batch(market_price, S, K, T, r, option_type)
+        if not converged:
+            return DEFAULT_VOLATILITY  # Default 20% volatility if calculation fails
+        return round(float(iv), 4)
+    
+    def process_chain_side(self, frame, current_price, time_to_exp, option_type, previous=None):
+        """
+        Process one side of a raw yfinance chain as whole columns
+        Returns a dict of NumPy arrays sorted by strike, holding CHAIN_FIELDS
+        plus the per-contract 'ivConverged' and 'repriced' flags.
+        previous: the same side processed earlier at the same tenor; rows whose
+        strike and lastPrice are unchanged keep its IV and Greeks, so only new
+        or re-traded contracts go through the solver.
+        """
+        frame = frame.sort_values('strike', kind='stable')
         
-        try:
-            iv = brentq(objective_function, 0.001, 5.0, xtol=1e-6, maxiter=100)
-            return round(iv, 4)
-        except (ValueError, RuntimeError):
-            return 0.20  # Default 20% volatility if calculation fails
+        def column(name):
+            if name not in frame:
+                return np.zeros(len(frame))
+            values = pd.to_numeric(frame[name], errors='coerce').to_numpy(dtype=float)
+            return np.nan_to_num(values, nan=0.0, posinf=0.0, neginf=0.0)
+        
+        strike = column('strike')
+        last_price = column('lastPrice')
+        n = len(strike)
+        
+        iv = np.full(n, DEFAULT_VOLATILITY)
+        iv_converged = np.zeros(n, dtype=bool)
+        greeks = {name: np.zeros(n) for name in GREEK_FIELDS}
+        
+        # Only contracts that have traded and not expired get a model price
+        priced = (last_price > 0) & (time_to_exp > 0)
+        
+        # Match rows to the previous chain by strike (both sides are strike-sorted)
+        reused = np.zeros(n, dtype=bool)
+        if previous is not None and len(previous['strike']):
+            match = np.minimum(np.searchsorted(previous['strike'], strike), len(previous['strike']) - 1)
+            reused = (previous['strike'][match] == strike) & (previous['lastPrice'][match] == last_price)
+            priced &= ~reused
+        
+        if priced.any():
+            solved, converged = self.implied_volatility_batch(
+                last_price[priced], current_price, strike[priced], time_to_exp,
+                self.risk_free_rate, option_type
+            )
+            priced_iv = np.where(converged, np.round(solved, 4), DEFAULT_VOLATILITY)
+            iv[priced] = priced_iv
+            iv_converged[priced] = converged
+            priced_greeks = self.calculate_greeks_batch(
+                current_price, strike[priced], time_to_exp, self.risk_free_rate, priced_iv, option_type
+            )
+            for name, values in priced_greeks.items():
+                greeks[name][priced] = values
+        
+        columns = {
+            'strike': strike,
+            'lastPrice': last_price,
+            'bid': column('bid'),
+            'ask': column('ask'),
+            'volume': column('volume').astype(np.int64),
+            'openInterest': column('openInterest').astype(np.int64),
+            'impliedVolatility': iv,
+            'theoreticalPrice': np.round(greeks['price'], 2),
+            'inTheMoney': current_price > strike if option_type == 'call' else current_price < strike,
+            'ivConverged': iv_converged,
+            'repriced': priced,
+        }
+        for name in GREEK_FIELDS[1:]:
+            columns[name] = np.round(greeks[name], 4)
+        
+        if reused.any():
+            for name in MODEL_FIELDS:
+                columns[name][reused] = previous[name][match[reused]]
+        return columns
     
-    def get_yahoo_options_data(self, symbol):
-        """Fetch options data from Yahoo Finance"""
-        try:
-            ticker = yf.Ticker(symbol)
-            stock_info = ticker.info
-            current_price = stock_info.get('currentPrice', stock_info.get('regularMarketPrice', 100))
-            
-            # Get options expiration dates
-            exp_dates = ticker.options
-            if not exp_dates:
-                return None
-            
-            options_data = {
-                'symbol': symbol,
-                'currentPrice': current_price,
-                'expirationDates': list(exp_dates),
-                'chains': {}
+    def filter_chain_side(self, columns, min_strike=None, max_strike=None, min_abs_delta=None,
+                          max_abs_delta=None, min_open_interest=None, min_volume=None):
+        """
+        Rows of one processed chain side that pass every given filter
+        Columns are sorted by strike, so the strike window is two binary searches
+        and the remaining row filters only look at rows inside it.
+        """
+        strikes = columns['strike']
+        start = 0 if min_strike is None else int(np.searchsorted(strikes, min_strike, side='left'))
+        stop = len(strikes) if max_strike is None else int(np.searchsorted(strikes, max_strike, side='right'))
+        window = {name: values[start:max(start, stop)] for name, values in columns.items()}
+
+        keep = np.ones(len(window['strike']), dtype=bool)
+        if min_abs_delta is not None:
+            keep &= np.abs(window['delta']) >= min_abs_delta
+        if max_abs_delta is not None:
+            keep &= np.abs(window['delta']) <= max_abs_delta
+        if min_open_interest is not None:
+            keep &= window['openInterest'] >= min_open_interest
+        if min_volume is not None:
+            keep &= window['volume'] >= min_volume
+
+        if keep.all():
+            return window
+        return {name: values[keep] for name, values in window.items()}
+
+    def filter_chain(self, options_data, expirations=None, side='both', min_strike=None, max_strike=None,
+                     min_moneyness=None, max_moneyness=None, min_abs_delta=None, max_abs_delta=None,
+                     min_open_interest=None, min_volume=None):
+        """
+        Window a columnar chain from get_options_chain without refetching it
+        expirations: subset of expiration dates to keep (None keeps all)
+        side: 'calls', 'puts' or 'both'; the other side is returned empty
+        Moneyness is strike / spot and narrows the strike range; delta bounds
+        apply to |delta| so one band selects both calls and puts.
+        """
+        if side not in ('calls', 'puts', 'both'):
+            raise ValueError("side must be one of calls, puts, both")
+
+        spot = options_data['currentPrice']
+        lower_bounds = [bound for bound in (min_strike, None if min_moneyness is None else min_moneyness * spot)
+                        if bound is not None]
+        upper_bounds = [bound for bound in (max_strike, None if max_moneyness is None else max_moneyness * spot)
+                        if bound is not None]
+        row_filters = {
+            'min_strike': max(lower_bounds) if lower_bounds else None,
+            'max_strike': min(upper_bounds) if upper_bounds else None,
+            'min_abs_delta': min_abs_delta,
+            'max_abs_delta': max_abs_delta,
+            'min_open_interest': min_open_interest,
+            'min_volume': min_volume,
+        }
+
+        chains = {}
+        for exp_date, chain in options_data['chains'].items():
+            if expirations is not None and exp_date not in expirations:
+                continue
+            filtered = {'timeToExpiration': chain['timeToExpiration']}
+            for chain_side in ('calls', 'puts'):
+                if side in (chain_side, 'both'):
+                    filtered[chain_side] = self.filter_chain_side(chain[chain_side], **row_filters)
+                else:
+                    filtered[chain_side] = {name: values[:0] for name, values in chain[chain_side].items()}
+            chains[exp_date] = filtered
+        return {**options_data, 'chains': chains}
+
+    def chain_records(self, columns):
+        """Build the list-of-dicts form of one processed chain side"""
+        values = [columns[name].tolist() for name in CHAIN_FIELDS]
+        return [dict(zip(CHAIN_FIELDS, row)) for row in zip(*values)]
+    
+    def chain_to_records(self, options_data):
+        """Convert a columnar chain from get_options_chain to the JSON response shape"""
+        chains = {}
+        for exp_date, chain in options_data['chains'].items():
+            chains[exp_date] = {
+                'calls': self.chain_records(chain['calls']),
+                'puts': self.chain_records(chain['puts']),
+                'timeToExpiration': chain['timeToExpiration']
             }
+        return {**options_data, 'chains': chains}
+
+    def chain_columns(self, columns, precision=None):
+        """Build the one-list-per-field form of one processed chain side"""
+        side = {}
+        for name in CHAIN_FIELDS:
+            values = columns[name]
+            if precision is not None and values.dtype.kind == 'f':
+                values = values.round(precision)
+            side[name] = values.tolist()
+        return side
+
+    def chain_to_columns(self, options_data, precision=None):
+        """
+        Convert a columnar chain to the compact JSON response shape
+        Each expiration side maps field name -> list, so field names are sent
+        once per side instead of once per contract; precision rounds floats.
+        """
+        chains = {}
+        for exp_date, chain in options_data['chains'].items():
+            chains[exp_date] = {
+                'calls': self.chain_columns(chain['calls'], precision),
+                'puts': self.chain_columns(chain['puts'], precision),
+                'timeToExpiration': chain['timeToExpiration']
+            }
+        return {**options_data, 'format': 'columnar', 'fields': list(CHAIN_FIELDS), 'chains': chains}
+
+    def chain_to_npz(self, options_data, precision=None):
+        """
+        Pack a columnar chain into an uncompressed .npz buffer for non-browser clients
+        Arrays are named '<expiration>/<calls|puts>/<field>' and a 'meta' entry holds
+        the remaining fields as a JSON string, so np.load needs no pickle support.
+        With a precision, floats are rounded and stored as float32.
+        """
+        arrays = {}
+        meta = {key: value for key, value in options_data.items() if key != 'chains'}
+        meta['timeToExpiration'] = {}
+        for exp_date, chain in options_data['chains'].items():
+            meta['timeToExpiration'][exp_date] = chain['timeToExpiration']
+            for side in ('calls', 'puts'):
+                for name in CHAIN_FIELDS:
+                    values = chain[side][name]
+                    if precision is not None and values.dtype.kind == 'f':
+                        values = values.round(precision).astype(np.float32)
+                    arrays[f"{exp_date}/{side}/{name}"] = values
+        arrays['meta'] = np.array(json.dumps(meta))
+
+        buffer = io.BytesIO()
+        np.savez(buffer, **arrays)
+        return buffer.getvalue()
+
+    def _load_expiration(self, symbol, exp_date, current_price, previous=None):
+        """
+        Fetch and process the chain for a single expiration
+        With a previous chain for the same expiration, unchanged contracts keep
+        their model values unless the tenor changed or spot has moved more than
+        reprice_spot_threshold since that chain was fully priced.
+        """
+        calls_df, puts_df = self.provider.get_option_chain(symbol, exp_date)
+        
+        # Calculate time to expiration
+        exp_datetime = datetime.strptime(exp_date, '%Y-%m-%d')
+        time_to_exp = (exp_datetime - datetime.now()).days / 365.0
+        
+        pricing_spot = current_price
+        if previous is not None:
+            spot_move = abs(current_price / previous['pricingSpot'] - 1)
+            if previous['timeToExpiration'] == time_to_exp and spot_move <= self.reprice_spot_threshold:
+                pricing_spot = previous['pricingSpot']
+            else:
+                previous = None
+        
+        chain = {
+            'calls': self.process_chain_side(calls_df, current_price, time_to_exp, 'call',
+                                             previous and previous['calls']),
+            'puts': self.process_chain_side(puts_df, current_price, time_to_exp, 'put',
+                                            previous and previous['puts']),
+            'timeToExpiration': time_to_exp,
+            'pricingSpot': pricing_spot  # Spot at the last full reprice
+        }
+        # Parametric smile cached with the chain; None when too few quotes converged
+        chain['smile'] = SVISmile.from_chain_slice(chain, current_price, self.risk_free_rate)
+        return chain
+    
+    def _timed_load_expiration(self, started, *args):
+        """_load_expiration that records when it got a pool thread"""
+        started.append(time.monotonic())
+        return self._load_expiration(*args)
+    
+    def load_expirations(self, symbol, exp_dates, current_price, previous_chains=None):
+        """
+        Fetch expirations concurrently, at most max_workers requests at a time
+        Requests run on the engine's shared fetch pool. Every request gets its
+        own expiration_timeout seconds from when it starts; a request that
+        times out is abandoned and the next expiration is submitted, so one hung
+        request cannot use up the time of the ones behind it. Abandoned requests
+        keep their pool thread until they return, so a request still waiting
+        for a thread after expiration_timeout is cancelled instead of queueing
+        behind them. Expirations that fail or time out are skipped and reported.
+        Returns (chains, failed_expirations) with chains in exp_dates order.
+        """
+        if not exp_dates:
+            return {}, []
+        
+        previous_chains = previous_chains or {}
+        workers = max(1, min(self.max_workers, len(exp_dates)))
+        queued = list(exp_dates)
+        running = {}  # future -> (expiration, [start time once running], submit time)
+        outcomes = {}  # expiration -> finished future, or None when it timed out
+        
+        def deadline(started, submitted):
+            return (started[0] if started else submitted) + self.expiration_timeout
+        
+        while queued or running:
+            while queued and len(running) < workers:
+                exp_date = queued.pop(0)
+                started = []
+                future = self._fetch_executor.submit(self._timed_load_expiration, started, symbol, exp_date,
+                                                     current_price, previous_chains.get(exp_date))
+                running[future] = (exp_date, started, time.monotonic())
             
-            # Get options chains for each expiration
-            for exp_date in exp_dates[:6]:  # Limit to first 6 expirations
-                try:
-                    opt_chain = ticker.option_chain(exp_date)
-                    calls_df = opt_chain.calls
-                    puts_df = opt_chain.puts
-                    
-                    # Calculate time to expiration
-                    exp_datetime = datetime.strptime(exp_date, '%Y-%m-%d')
-                    time_to_exp = (exp_datetime - datetime.now()).days / 365.0
-                    
-                    # Process calls
-                    calls_processed = []
-                    for _, call in calls_df.iterrows():
-                        strike = call['strike']
-                        last_price = call.get('lastPrice', 0)
-                        bid = call.get('bid', 0)
-                        ask = call.get('ask', 0)
-                        volume = call.get('volume', 0)
-                        open_interest = call.get('openInterest', 0)
-                        
-                        # Calculate theoretical price and Greeks
-                        if last_price > 0 and time_to_exp > 0:
-                            iv = self.implied_volatility(last_price, current_price, strike, time_to_exp, self.risk_free_rate, 'call')
-                            theoretical_price = self.black_scholes_call(current_price, strike, time_to_exp, self.risk_free_rate, iv)
-                            greeks = self.calculate_greeks(current_price, strike, time_to_exp, self.risk_free_rate, iv, 'call')
-                        else:
-                            iv = 0.20
-                            theoretical_price = 0
-                            greeks = {'delta': 0, 'gamma': 0, 'theta': 0, 'vega': 0, 'rho': 0}
-                        
-                        calls_processed.append({
-                            'strike': self.safe_float(strike),
-                            'lastPrice': self.safe_float(last_price),
-                            'bid': self.safe_float(bid),
-                            'ask': self.safe_float(ask),
-                            'volume': self.safe_int(volume),
-                            'openInterest': self.safe_int(open_interest),
-                            'impliedVolatility': self.safe_float(iv),
-                            'theoreticalPrice': round(self.safe_float(theoretical_price), 2),
-                            'delta': self.safe_float(greeks['delta']),
-                            'gamma': self.safe_float(greeks['gamma']),
-                            'theta': self.safe_float(greeks['theta']),
-                            'vega': self.safe_float(greeks['vega']),
-                            'rho': self.safe_float(greeks['rho']),
-                            'inTheMoney': current_price > strike
-                        })
-                    
-                    # Process puts
-                    puts_processed = []
-                    for _, put in puts_df.iterrows():
-                        strike = put['strike']
-                        last_price = put.get('lastPrice', 0)
-                        bid = put.get('bid', 0)
-                        ask = put.get('ask', 0)
-                        volume = put.get('volume', 0)
-                        open_interest = put.get('openInterest', 0)
-                        
-                        # Calculate theoretical price and Greeks
-                        if last_price > 0 and time_to_exp > 0:
-                            iv = self.implied_volatility(last_price, current_price, strike, time_to_exp, self.risk_free_rate, 'put')
-                            theoretical_price = self.black_scholes_put(current_price, strike, time_to_exp, self.risk_free_rate, iv)
-                            greeks = self.calculate_greeks(current_price, strike, time_to_exp, self.risk_free_rate, iv, 'put')
-                        else:
-                            iv = 0.20
-                            theoretical_price = 0
-                            greeks = {'delta': 0, 'gamma': 0, 'theta': 0, 'vega': 0, 'rho': 0}
-                        
-                        puts_processed.append({
-                            'strike': self.safe_float(strike),
-                            'lastPrice': self.safe_float(last_price),
-                            'bid': self.safe_float(bid),
-                            'ask': self.safe_float(ask),
-                            'volume': self.safe_int(volume),
-                            'openInterest': self.safe_int(open_interest),
-                            'impliedVolatility': self.safe_float(iv),
-                            'theoreticalPrice': round(self.safe_float(theoretical_price), 2),
-                            'delta': self.safe_float(greeks['delta']),
-                            'gamma': self.safe_float(greeks['gamma']),
-                            'theta': self.safe_float(greeks['theta']),
-                            'vega': self.safe_float(greeks['vega']),
-                            'rho': self.safe_float(greeks['rho']),
-                            'inTheMoney': current_price < strike
-                        })
-                    
-                    options_data['chains'][exp_date] = {
-                        'calls': sorted(calls_processed, key=lambda x: x['strike']),
-                        'puts': sorted(puts_processed, key=lambda x: x['strike']),
-                        'timeToExpiration': time_to_exp
-                    }
-                    
-                except Exception as e:
-                    print(f"Error processing expiration {exp_date}: {e}")
+            next_deadline = min(deadline(started, submitted) for _, started, submitted in running.values())
+            done, _ = wait(running, timeout=max(0.0, next_deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            now = time.monotonic()
+            for future, (exp_date, started, submitted) in list(running.items()):
+                if future in done:
+                    outcomes[exp_date] = future
+                elif now >= deadline(started, submitted) and (started or future.cancel()):
+                    outcomes[exp_date] = None  # Abandoned while running, or cancelled before it got a thread
+                else:
                     continue
+                del running[future]
+        
+        chains, failed = {}, []
+        for exp_date in exp_dates:
+            future = outcomes[exp_date]
+            if future is None:
+                print(f"Timed out fetching expiration {exp_date} for {symbol}")
+                failed.append(exp_date)
+            elif future.exception() is not None:
+                print(f"Error processing expiration {exp_date}: {future.exception()}")
+                failed.append(exp_date)
+            else:
+                chains[exp_date] = future.result()
+        return chains, failed
+    
+    def get_expiration_index(self, symbol):
+        """Spot price and listed expiration dates, without fetching any chain"""
+        exp_dates = self.provider.get_expirations(symbol)
+        if not exp_dates:
+            return None
+        return {
+            'symbol': symbol,
+            'currentPrice': self.provider.get_quote(symbol),
+            'expirationDates': list(exp_dates)
+        }
+    
+    def build_options_data(self, index, chains, failed=(), refreshed=None):
+        """
+        Assemble per-expiration chains into the get_options_chain result
+        refreshed: expirations processed by this call (default all); only their
+        repriced rows count towards recomputedContracts.
+        """
+        refreshed = chains.keys() if refreshed is None else refreshed
+        sides = [(exp_date, chain[side]) for exp_date, chain in chains.items() for side in ('calls', 'puts')]
+        return {
+            **index,
+            'chains': chains,
+            'failedExpirations': list(failed),
+            'totalContracts': sum(len(columns['strike']) for _, columns in sides),
+            'recomputedContracts': int(sum(columns['repriced'].sum()
+                                           for exp_date, columns in sides if exp_date in refreshed))
+        }
+    
+    def get_options_chain(self, symbol, previous=None, expirations=None):
+        """
+        Fetch options data and process it into columnar chains
+        previous: an earlier get_options_chain result for the symbol; its chains
+        are diffed against the new quotes so only changed contracts are repriced.
+        expirations: dates to load (default the nearest max_expirations)
+        """
+        try:
+            index = self.get_expiration_index(symbol)
+            if index is None:
+                return None
             
-            return options_data
+            if expirations is None:
+                expirations = index['expirationDates'][:self.max_expirations]
+            chains, failed = self.load_expirations(
+                symbol, expirations, index['currentPrice'],
+                previous['chains'] if previous else None
+            )
+            return self.build_options_data(index, chains, failed)
             
         except Exception as e:
             print(f"Error fetching options data for {symbol}: {e}")
             return None
     
-    def calculate_strategy_payoff(self, strategy_legs, spot_prices):
-        """Calculate payoff for an options strategy"""
-        payoffs = []
-        
-        for spot in spot_prices:
-            total_payoff = 0
+    def get_yahoo_options_data(self, symbol):
+        """Fetch options data from Yahoo Finance"""
+        options_data = self.get_options_chain(symbol)
+        if options_data is None:
+            return None
+        return self.chain_to_records(options_data)
+    
+    def get_quotes(self, symbols):
+        """Fetch current prices for distinct symbols concurrently; returns {symbol: price}"""
+        symbols = sorted(set(symbols))
+        if not symbols:
+            return {}
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(symbols)))) as executor:
+            prices = executor.map(self.provider.get_quote, symbols)
+            return {symbol: float(price) for symbol, price in zip(symbols, prices)}
+    
+    def position_arrays(self, positions, default_volatility=DEFAULT_VOLATILITY):
+        """
+        Convert option positions to arrays for vectorized risk
+        Each position has symbol, type ('call'/'put'), strike, expiration
+        ('YYYY-MM-DD') or daysToExpiration, a signed 'quantity' of contracts
+        (or 'action' plus 'contracts'), and optionally impliedVolatility.
+        """
+        now = datetime.now()
+        symbols, strikes, tenors, is_call, quantities, vols = [], [], [], [], [], []
+        for position in positions:
+            if position['type'] not in ('call', 'put'):
+                raise ValueError(f"Unsupported position type: {position['type']}")
+            if 'expiration' in position:
+                days = (datetime.strptime(position['expiration'], '%Y-%m-%d') - now).days
+            else:
+                days = float(position['daysToExpiration'])
+            if 'quantity' in position:
+                quantity = float(position['quantity'])
+            else:
+                quantity = (-1 if position.get('action') == 'sell' else 1) * float(position.get('contracts', 1))
             
-            for leg in strategy_legs:
-                action = leg['action']  # 'buy' or 'sell'
-                option_type = leg['type']  # 'call' or 'put'
-                strike = leg['strike']
-                premium = leg['premium']
-                contracts = leg.get('contracts', 1)
-                
-                # Calculate intrinsic value at expiration
-                if option_type == 'call':
-                    intrinsic_value = max(spot - strike, 0)
-                else:  # put
-                    intrinsic_value = max(strike - spot, 0)
-                
-                # Calculate P&L for this leg
-                if action == 'buy':
-                    leg_payoff = (intrinsic_value - premium) * contracts * 100
-                else:  # sell
-                    leg_payoff = (premium - intrinsic_value) * contracts * 100
-                
-                total_payoff += leg_payoff
+            symbols.append(position['symbol'].upper())
+            strikes.append(float(position['strike']))
+            tenors.append(days / 365.0)
+            is_call.append(position['type'] == 'call')
+            quantities.append(quantity)
+            vols.append(float(position.get('impliedVolatility', default_volatility)))
+        
+        return {
+            'symbol': np.array(symbols),
+            'strike': np.array(strikes),
+            'tenor': np.array(tenors),
+            'is_call': np.array(is_call, dtype=bool),
+            'quantity': np.array(quantities),
+            'volatility': np.array(vols)
+        }
+    
+    def portfolio_greeks(self, arrays, spots):
+        """
+        Net Greeks per underlying and in total for position_arrays output
+        spots: {symbol: price}. Greeks are position-weighted (x100 shares per
+        contract); dollarDelta is delta x spot and dollarGamma is the change in
+        dollar delta for a 1% move (gamma x spot^2 / 100).
+        """
+        underlyings, index = np.unique(arrays['symbol'], return_inverse=True)
+        spot = np.array([spots[symbol] for symbol in underlyings])[index]
+        greeks = self.calculate_greeks_batch(
+            spot, arrays['strike'], arrays['tenor'], self.risk_free_rate, arrays['volatility'], arrays['is_call']
+        )
+        shares = arrays['quantity'] * 100
+        
+        columns = {name: greeks[name] * shares for name in ('delta', 'gamma', 'theta', 'vega', 'rho')}
+        columns['marketValue'] = greeks['price'] * shares
+        columns['dollarDelta'] = columns['delta'] * spot
+        columns['dollarGamma'] = columns['gamma'] * spot ** 2 / 100
+        
+        per_underlying = {}
+        totals = {}
+        for name, values in columns.items():
+            sums = np.bincount(index, weights=values, minlength=len(underlyings))
+            for symbol, value in zip(underlyings, sums):
+                per_underlying.setdefault(str(symbol), {})[name] = round(float(value), 4)
+            totals[name] = round(float(values.sum()), 4)
+        
+        counts = np.bincount(index, minlength=len(underlyings))
+        for symbol, count in zip(underlyings, counts):
+            per_underlying[str(symbol)]['positions'] = int(count)
+            per_underlying[str(symbol)]['spot'] = spots[symbol]
+        totals['positions'] = int(len(index))
+        
+        return {'underlyings': per_underlying, 'total': totals}
+    
+    def strategy_leg_arrays(self, strategy_legs, current_price=None):
+        """
+        Convert strategy legs to arrays for broadcast evaluation
+        Returns (strikes, costs, is_call, is_stock, quantities):
+        - option legs: cost is the premium, quantity is +/-100 shares per contract
+        - stock legs ({'type': 'stock', 'shares': 100}): cost is the leg's 'price'
+          (default current_price), quantity is the signed share count
+        Bought and held legs are long; sold legs are short.
+        """
+        strikes, costs, is_call, is_stock, quantities = [], [], [], [], []
+        for leg in strategy_legs:
+            direction = -1 if leg['action'] == 'sell' else 1
+            if leg['type'] == 'stock':
+                cost_basis = leg.get('price', current_price)
+                if cost_basis is None:
+                    raise ValueError("Stock legs need a 'price' or the strategy's current price")
+                strikes.append(0.0)
+                costs.append(float(cost_basis))
+                quantities.append(direction * float(leg.get('shares', 100)))
+            elif leg['type'] in ('call', 'put'):
+                strikes.append(float(leg['strike']))
+                costs.append(float(leg['premium']))
+                quantities.append(direction * float(leg.get('contracts', 1)) * 100)
+            else:
+                raise ValueError(f"Unsupported leg type: {leg['type']}")
+            is_call.append(leg['type'] == 'call')
+            is_stock.append(leg['type'] == 'stock')
+        return (np.array(strikes), np.array(costs), np.array(is_call, dtype=bool),
+                np.array(is_stock, dtype=bool), np.array(quantities))
+    
+    def strategy_pnl_matrix(self, leg_arrays, spot_prices):
+        """Legs x spots matrix of expiration P&L from strategy_leg_arrays output"""
+        strikes, costs, is_call, is_stock, quantities = (x[:, np.newaxis] for x in leg_arrays)
+        spots = np.asarray(spot_prices, dtype=float)[np.newaxis, :]
+        value = np.where(is_stock, spots, np.maximum(np.where(is_call, spots - strikes, strikes - spots), 0.0))
+        return (value - costs) * quantities
+    
+    def calculate_strategy_payoff(self, strategy_legs, spot_prices, current_price=None):
+        """Calculate expiration payoff for a strategy of option and stock legs"""
+        leg_arrays = self.strategy_leg_arrays(strategy_legs, current_price)
+        return self.strategy_pnl_matrix(leg_arrays, spot_prices).sum(axis=0).tolist()
+    
+    def strategy_pnl_surface(self, strategy_legs, current_price, spot_prices, days_remaining,
+                             vol_shifts, leg_days, leg_vols):
+        """
+        Mark-to-model P&L on a spot x days-remaining x vol-shift grid
+        leg_days / leg_vols: per-leg days to expiration today and implied
+        volatility (ignored for stock legs). days_remaining counts down to the
+        nearest option expiration; later legs keep their extra time.
+        All grid cells are priced in one broadcast Black-Scholes evaluation.
+        Returns an array of shape (spots, days, vol shifts).
+        """
+        leg_arrays = self.strategy_leg_arrays(strategy_legs, current_price)
+        strikes, costs, is_call, is_stock, quantities = leg_arrays
+        spots = np.asarray(spot_prices, dtype=float)
+        days = np.asarray(days_remaining, dtype=float)
+        shifts = np.asarray(vol_shifts, dtype=float)
+        
+        # Stock legs are linear in spot and unaffected by time or volatility
+        stock_pnl = ((spots[:, np.newaxis] - costs[is_stock]) * quantities[is_stock]).sum(axis=1)
+        surface = np.broadcast_to(stock_pnl[:, np.newaxis, np.newaxis], (len(spots), len(days), len(shifts))).copy()
+        
+        options = ~is_stock
+        if options.any():
+            option_days = np.asarray(leg_days, dtype=float)[options]
+            option_vols = np.asarray(leg_vols, dtype=float)[options]
+            # Days count down from the nearest live expiration; a leg already expired is held at intrinsic
+            elapsed = max(option_days.min(), 0.0) - days
             
-            payoffs.append(total_payoff)
+            # Axes: (legs, spots, days, vol shifts)
+            tenors = np.maximum(option_days[:, None, None, None] - elapsed[None, None, :, None], 0.0) / 365.0
+            vols = np.maximum(option_vols[:, None, None, None] + shifts[None, None, None, :], 0.01)
+            values = self.black_scholes_price(
+                spots[None, :, None, None], strikes[options][:, None, None, None], tenors,
+                self.risk_free_rate, vols, is_call[options][:, None, None, None]
+            )
+            leg_pnl = (values - costs[options][:, None, None, None]) * quantities[options][:, None, None, None]
+            surface += leg_pnl.sum(axis=0)
         
-        return payoffs
+        return surface
     
     def analyze_strategy(self, strategy_legs, current_price):
-        """Analyze an options strategy"""
-        # Calculate spot price range for analysis
-        spot_range = np.linspace(current_price * 0.7, current_price * 1.3, 100)
-        payoffs = self.calculate_strategy_payoff(strategy_legs, spot_range)
+        """
+        Analyze a strategy's expiration P&L exactly
+        The payoff is piecewise linear with kinks only at the option strikes, so
+        it is evaluated at zero and at each strike; beyond the highest strike it
+        moves with the slope of the call and stock legs. Breakevens, max profit
+        and max loss follow in O(number of legs), including unbounded cases.
+        """
+        leg_arrays = self.strategy_leg_arrays(strategy_legs, current_price)
+        strikes, _, is_call, is_stock, quantities = leg_arrays
+        
+        kinks = np.unique(np.concatenate([[0.0], strikes[~is_stock]]))
+        kink_pnl = self.strategy_pnl_matrix(leg_arrays, kinks).sum(axis=0)
+        right_slope = quantities[is_call | is_stock].sum()
         
-        # Find max profit, max loss, and breakeven points
-        max_profit = max(payoffs)
-        max_loss = min(payoffs)
+        max_profit = float('inf') if right_slope > 0 else float(kink_pnl.max())
+        max_loss = float('-inf') if right_slope < 0 else float(kink_pnl.min())
         
-        # Find breakeven points (where payoff crosses zero)
-        breakevens = []
-        for i in range(len(payoffs) - 1):
-            if (payoffs[i] <= 0 and payoffs[i + 1] > 0) or (payoffs[i] >= 0 and payoffs[i + 1] < 0):
-                # Linear interpolation to find exact breakeven
-                breakeven = spot_range[i] + (spot_range[i + 1] - spot_range[i]) * (-payoffs[i] / (payoffs[i + 1] - payoffs[i]))
-                breakevens.append(round(breakeven, 2))
+        # Zero crossings inside each segment between consecutive kinks
+        left, right = kink_pnl[:-1], kink_pnl[1:]
+        crossing = left * right < 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            roots = kinks[:-1] + (kinks[1:] - kinks[:-1]) * (-left / (right - left))
+        breakevens = list(roots[crossing])
+        
+        # A strike where P&L is zero is a breakeven only if P&L changes sign through it; a flat run
+        # at zero counts once, at its first strike, so offsetting legs report none
+        signs = np.sign(kink_pnl)
+        for i in np.flatnonzero(signs == 0):
+            if i == 0 or signs[i - 1] == 0:
+                continue
+            following = signs[i + 1:][signs[i + 1:] != 0]
+            after = following[0] if len(following) else np.sign(right_slope)
+            if after == -signs[i - 1]:
+                breakevens.append(kinks[i])
+        
+        # Crossing beyond the highest strike
+        last_pnl = kink_pnl[-1]
+        if right_slope != 0 and last_pnl != 0 and np.sign(last_pnl) != np.sign(right_slope):
+            breakevens.append(kinks[-1] - last_pnl / right_slope)
+        breakevens = sorted(round(float(breakeven), 2) for breakeven in breakevens)
         
         # Calculate net premium
-        net_premium = sum(leg['premium'] * leg.get('contracts', 1) * (1 if leg['action'] == 'sell' else -1) for leg in strategy_legs)
+        net_premium = sum(leg['premium'] * leg.get('contracts', 1) * (1 if leg['action'] == 'sell' else -1)
+                          for leg in strategy_legs if leg['type'] != 'stock')
+        
+        # Sampled curve for charting
+        spot_range = np.linspace(current_price * 0.7, current_price * 1.3, 100)
+        payoffs = self.strategy_pnl_matrix(leg_arrays, spot_range).sum(axis=0)
         
         return {
             'maxProfit': round(max_profit, 2) if max_profit < float('inf') else 'Unlimited',
@@ -300,7 +837,7 @@ class OptionsPricingEngine:
             'breakevens': breakevens,
             'netPremium': round(net_premium, 2),
             'spotRange': spot_range.tolist(),
-            'payoffs': payoffs
+            'payoffs': payoffs.tolist()
         }
 
 # Predefined strategy templates
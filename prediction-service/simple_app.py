@@ -2,11 +2,12 @@ from flask import Flask, request, jsonify
 from flask_cors import CORS
 import json
 import time
-import yfinance as yf
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 
+from ohlcv_store import get_history
+
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
@@ -40,8 +41,7 @@ def predict_simple(symbol):
                 })
         
         # Fetch historical data
-        stock = yf.Ticker(symbol)
-        data = stock.history(period="2y")  # 2 years of data
+        data = get_history(symbol, "2y")  # 2 years of data from the local store
         
         if data.empty:
             return jsonify({
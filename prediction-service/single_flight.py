@@ -0,0 +1,78 @@
+"""
+Single-flight coalescing of concurrent upstream calls
+Callers asking for the same key while a call for it is in flight wait for
+that call and share its result (or its exception) instead of starting their
+own. Keys are (symbol, dataset, period) tuples, so a burst of requests for one
+symbol at the market open costs one download and one model fit.
+"""
+
+import threading
+from collections import defaultdict
+
+
+class _Call:
+    """One in-flight upstream call and the callers waiting on it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Run at most one call per key at a time and count how many callers were coalesced"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = defaultdict(lambda: {'calls': 0, 'coalesced': 0, 'errors': 0, 'max_waiters': 0})
+
+    def do(self, key, func):
+        """
+        Return (result, shared) of func() for key
+        shared is True when this caller waited on another caller's call.
+        """
+        dataset = key[1] if isinstance(key, tuple) and len(key) > 1 else key
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            stats = self._stats[dataset]
+            if leader:
+                call = self._calls[key] = _Call()
+                stats['calls'] += 1
+            else:
+                call.waiters += 1
+                stats['coalesced'] += 1
+                stats['max_waiters'] = max(stats['max_waiters'], call.waiters)
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func()
+        except Exception as e:
+            call.error = e
+            with self._lock:
+                self._stats[dataset]['errors'] += 1
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def stats(self):
+        """Upstream calls, coalesced callers and errors per dataset, plus calls in flight"""
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'datasets': {dataset: dict(stats) for dataset, stats in self._stats.items()}
+            }
+
+
+# Shared by the history store, the options loaders and the prediction endpoints
+upstream_flights = SingleFlight()
@@ -1,4 +1,3 @@
-import yfinance as yf
 import pandas as pd
 import numpy as np
 from sklearn.preprocessing import MinMaxScaler
@@ -11,19 +10,22 @@ from datetime import datetime, timedelta
 import warnings
 warnings.filterwarnings('ignore')
 
+from ohlcv_store import HistoryContext
+
 class StockPredictor:
-    def __init__(self, symbol):
+    def __init__(self, symbol, context=None):
         self.symbol = symbol.upper()
+        # One history load per prediction run; shorter windows are sliced from it
+        self.context = context or HistoryContext(self.symbol)
         self.scaler = MinMaxScaler(feature_range=(0, 1))
         self.model = None
         self.sequence_length = 60  # Use 60 days of data to predict next day
         self.features = []
         
     def fetch_data(self, period="5y"):
-        """Fetch historical stock data"""
+        """Historical stock data for a period, sliced from this run's history context"""
         try:
-            stock = yf.Ticker(self.symbol)
-            data = stock.history(period=period)
+            data = self.context.history(period)
             
             if data.empty:
                 raise ValueError(f"No data found for symbol {self.symbol}")
@@ -74,10 +76,14 @@ class StockPredictor:
         
         return df
     
-    def prepare_data(self, data):
+    def indicator_frame(self, period=None):
+        """Technical indicators computed once over the loaded history, sliced to a period"""
+        return self.context.derived('indicators', self.add_technical_indicators, period)
+    
+    def prepare_data(self, data, indicators=None):
         """Prepare data for LSTM model"""
         # Add technical indicators
-        df = self.add_technical_indicators(data)
+        df = indicators if indicators is not None else self.add_technical_indicators(data)
         
         # Select features for training
         feature_columns = [
@@ -142,12 +148,12 @@ class StockPredictor:
         if data is None:
             return False
         
-        X_train, X_test, y_train, y_test, processed_data = self.prepare_data(data)
+        X_train, X_test, y_train, y_test, processed_data = self.prepare_data(data, self.indicator_frame())
         
         # Build and train model
         self.model = self.build_model((X_train.shape[1], X_train.shape[2]))
         
-        history = self.model.fit(
+        history = self.context.timed('fit', self.model.fit,
             X_train, y_train,
             epochs=epochs,
             batch_size=batch_size,
@@ -173,8 +179,7 @@ class StockPredictor:
             raise ValueError("Model not trained. Call train() first.")
         
         # Get recent data for prediction
-        data = self.fetch_data(period="2y")
-        df = self.add_technical_indicators(data)
+        df = self.indicator_frame(period="2y")
         df = df.dropna()
         
         # Prepare last sequence for prediction
@@ -213,7 +218,7 @@ class StockPredictor:
     
     def get_prediction_with_confidence(self, days=365):
         """Get predictions with confidence intervals"""
-        predictions = self.predict_future(days)
+        predictions = self.context.timed('forecast', self.predict_future, days)
         
         # Calculate confidence intervals based on historical volatility
         data = self.fetch_data(period="1y")
@@ -245,10 +250,15 @@ class StockPredictor:
             'symbol': self.symbol
         }
 
-def get_stock_prediction(symbol, days=365):
-    """Main function to get stock predictions"""
+def get_stock_prediction(symbol, days=365, history=None):
+    """
+    Main function to get stock predictions
+    history: optional loader(symbol, period) such as HistoryPanel.get_history,
+    used by batch requests that preloaded every symbol's bars
+    """
     try:
-        predictor = StockPredictor(symbol)
+        context = HistoryContext(symbol, loader=history) if history else None
+        predictor = StockPredictor(symbol, context)
         
         # Train the model
         success = predictor.train(epochs=30)
@@ -257,6 +267,7 @@ def get_stock_prediction(symbol, days=365):
         
         # Get predictions
         result = predictor.get_prediction_with_confidence(days)
+        print(predictor.context.summary())
         return result
         
     except Exception as e:
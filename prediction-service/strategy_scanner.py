@@ -0,0 +1,247 @@
+"""
+Strategy scanner over a cached options chain
+Builds every valid strike combination for a template, scores all of them
+with array operations and returns the top-K. Probabilities and expected
+values come from the risk-neutral terminal distribution implied by the
+chain's call deltas and implied vols. Spreads that cannot make money
+(non-positive debit/credit, too wide, short strikes in the money or above the
+delta limit) are pruned before combinations are formed, and four-leg
+condors are scored in bounded blocks so memory stays flat on wide chains.
+"""
+
+import numpy as np
+from scipy.special import ndtr, ndtri
+
+from options_pricing import STRATEGY_TEMPLATES
+
+SCANNABLE_TEMPLATES = ('bull_call_spread', 'bear_put_spread', 'iron_condor')
+RANK_FIELDS = ('expectedValue', 'returnOnRisk', 'probabilityOfProfit', 'maxProfit')
+
+
+class StrategyScanner:
+    """Rank strike combinations for strategy templates on one expiration"""
+
+    def __init__(self, max_block=1000000, risk_free_rate=0.05):
+        self.max_block = max_block  # Condor combinations scored per array pass
+        self.risk_free_rate = risk_free_rate  # Discounts expected payoffs at expiry to today
+
+    def _quotes(self, columns):
+        """Strikes, mid prices and deltas of contracts with a usable price"""
+        bid, ask, last = columns['bid'], columns['ask'], columns['lastPrice']
+        premium = np.where((bid > 0) & (ask > 0), 0.5 * (bid + ask), last)
+        usable = premium > 0
+        return columns['strike'][usable], premium[usable], columns['delta'][usable]
+
+    def _terminal_distribution(self, chain):
+        """
+        (prob_above, area_above) for the risk-neutral terminal price
+        prob_above(x) is P(S_T > x) = N(d2), recovered from each call's delta
+        N(d1) and implied vol, interpolated linearly between strikes and flat
+        beyond them. area_above(a, b) is its exact integral from a to b, which
+        is E[min(max(S_T - a, 0), b - a)]: the expected payoff at expiry of a
+        unit call spread between a and b.
+        """
+        calls = chain['calls']
+        priced = calls['delta'] != 0
+        if priced.sum() < 2:
+            raise ValueError("Not enough priced calls to estimate probabilities")
+        strikes = calls['strike'][priced]
+        vol_sqrt_t = calls['impliedVolatility'][priced] * np.sqrt(max(chain['timeToExpiration'], 0.0))
+        deltas = ndtr(ndtri(np.clip(calls['delta'][priced], 1e-12, 1 - 1e-12)) - vol_sqrt_t)
+        # Integral of the piecewise-linear P(S_T > x) from the first strike to each strike
+        knot_area = np.concatenate([[0.0], np.cumsum(0.5 * (deltas[1:] + deltas[:-1]) * np.diff(strikes))])
+
+        def prob_above(prices):
+            return np.interp(prices, strikes, deltas)
+
+        def area_to(prices):
+            prices = np.asarray(prices, dtype=float)
+            segment = np.clip(np.searchsorted(strikes, prices, side='right') - 1, 0, len(strikes) - 2)
+            inside = knot_area[segment] + (prices - strikes[segment]) * 0.5 * (deltas[segment] + prob_above(prices))
+            below = (prices - strikes[0]) * deltas[0]
+            above = knot_area[-1] + (prices - strikes[-1]) * deltas[-1]
+            return np.where(prices < strikes[0], below, np.where(prices > strikes[-1], above, inside))
+
+        return prob_above, lambda lower, upper: area_to(upper) - area_to(lower)
+
+    def scan(self, chain, spot, template, top_k=10, rank='expectedValue',
+             max_width=None, max_short_delta=None, min_probability=0.0):
+        """Score every combination for a template and return the best top_k"""
+        if template not in SCANNABLE_TEMPLATES:
+            raise ValueError(f"Template must be one of {', '.join(SCANNABLE_TEMPLATES)}")
+        if rank not in RANK_FIELDS:
+            raise ValueError(f"rank must be one of {', '.join(RANK_FIELDS)}")
+
+        distribution = self._terminal_distribution(chain)
+        discount = np.exp(-self.risk_free_rate * max(chain['timeToExpiration'], 0.0))
+        max_width = float('inf') if max_width is None else max_width
+        max_short_delta = 1.0 if max_short_delta is None else max_short_delta
+
+        if template == 'iron_condor':
+            metrics, legs = self._scan_condors(chain, spot, distribution, discount, max_width, max_short_delta,
+                                               top_k, rank, min_probability)
+        else:
+            metrics, legs = self._scan_verticals(chain, template, distribution, discount, max_width,
+                                                 max_short_delta)
+            metrics, legs = self._select(metrics, legs, top_k, rank, min_probability)
+
+        return [self._describe(template, metrics, legs, row) for row in range(len(metrics['score']))]
+
+    def _vertical_pairs(self, strikes, max_width):
+        """Index pairs (lower, upper) of distinct strikes within max_width"""
+        lower, upper = np.triu_indices(len(strikes), k=1)
+        keep = strikes[upper] - strikes[lower] <= max_width
+        return lower[keep], upper[keep]
+
+    def _scan_verticals(self, chain, template, distribution, discount, max_width, max_short_delta):
+        prob_above, area_above = distribution
+        side = 'calls' if template == 'bull_call_spread' else 'puts'
+        strikes, premium, delta = self._quotes(chain[side])
+        lower, upper = self._vertical_pairs(strikes, max_width)
+        width = strikes[upper] - strikes[lower]
+
+        if template == 'bull_call_spread':
+            # Buy the lower call, sell the upper call
+            long_idx, short_idx = lower, upper
+            debit = premium[lower] - premium[upper]
+            breakeven = strikes[lower] + debit
+            probability = prob_above(breakeven)
+            # Expected payoff of the long call spread between the two strikes
+            spread_value = area_above(strikes[lower], strikes[upper])
+        else:
+            # Buy the upper put, sell the lower put
+            long_idx, short_idx = upper, lower
+            debit = premium[upper] - premium[lower]
+            breakeven = strikes[upper] - debit
+            probability = 1 - prob_above(breakeven)
+            # Expected payoff of the long put spread: width minus the call spread over the same strikes
+            spread_value = width - area_above(strikes[lower], strikes[upper])
+
+        # A spread can only win if it costs something less than its width
+        viable = (debit > 0) & (debit < width) & (np.abs(delta[short_idx]) <= max_short_delta)
+        long_idx, short_idx, debit, width = long_idx[viable], short_idx[viable], debit[viable], width[viable]
+        max_profit = (width - debit) * 100
+        max_loss = debit * 100
+        expected_value = (discount * spread_value[viable] - debit) * 100
+        metrics = self._metrics(max_profit, max_loss, probability[viable], expected_value, -debit)
+        metrics['breakevens'] = breakeven[viable][:, np.newaxis]
+        legs = [
+            ('buy', side[:-1], strikes[long_idx], premium[long_idx]),
+            ('sell', side[:-1], strikes[short_idx], premium[short_idx]),
+        ]
+        return metrics, legs
+
+    def _credit_spreads(self, columns, spot, side, max_width, max_short_delta):
+        """Out-of-the-money credit spreads on one side: (short, long strikes and premiums, credit)"""
+        strikes, premium, delta = self._quotes(columns)
+        lower, upper = self._vertical_pairs(strikes, max_width)
+        if side == 'put':
+            short_idx, long_idx = upper, lower
+            otm = strikes[short_idx] <= spot
+        else:
+            short_idx, long_idx = lower, upper
+            otm = strikes[short_idx] >= spot
+        credit = premium[short_idx] - premium[long_idx]
+        width = np.abs(strikes[short_idx] - strikes[long_idx])
+        viable = otm & (credit > 0) & (credit < width) & (np.abs(delta[short_idx]) <= max_short_delta)
+        short_idx, long_idx = short_idx[viable], long_idx[viable]
+        return {
+            'short_strike': strikes[short_idx], 'short_premium': premium[short_idx],
+            'long_strike': strikes[long_idx], 'long_premium': premium[long_idx],
+            'credit': credit[viable], 'width': width[viable]
+        }
+
+    def _scan_condors(self, chain, spot, distribution, discount, max_width, max_short_delta, top_k, rank, min_probability):
+        puts = self._credit_spreads(chain['puts'], spot, 'put', max_width, max_short_delta)
+        calls = self._credit_spreads(chain['calls'], spot, 'call', max_width, max_short_delta)
+        n_puts, n_calls = len(puts['credit']), len(calls['credit'])
+        if not n_puts or not n_calls:
+            return self._select(self._metrics(*(np.empty(0),) * 5), [], top_k, rank, min_probability)
+
+        # Score put spreads x call spreads in blocks, keeping a running top-K
+        best_scores = np.empty(0)
+        best_pairs = np.empty((0, 2), dtype=int)
+        block_rows = max(1, self.max_block // n_calls)
+        for start in range(0, n_puts, block_rows):
+            rows = np.arange(start, min(start + block_rows, n_puts))
+            put_idx, call_idx = (grid.ravel() for grid in np.meshgrid(rows, np.arange(n_calls), indexing='ij'))
+            metrics = self._condor_metrics(puts, calls, put_idx, call_idx, distribution, discount)
+            scores = np.where(metrics['probabilityOfProfit'] >= min_probability, metrics[rank], -np.inf)
+
+            scores = np.concatenate([best_scores, scores])
+            pairs = np.concatenate([best_pairs, np.column_stack([put_idx, call_idx])])
+            if len(scores) > top_k:
+                candidates = np.argpartition(-scores, top_k)[:top_k]
+            else:
+                candidates = np.arange(len(scores))
+            keep = candidates[np.argsort(-scores[candidates], kind='stable')]
+            keep = keep[np.isfinite(scores[keep])]
+            best_scores, best_pairs = scores[keep], pairs[keep]
+
+        put_idx, call_idx = best_pairs[:, 0], best_pairs[:, 1]
+        metrics = self._condor_metrics(puts, calls, put_idx, call_idx, distribution, discount)
+        metrics['score'] = best_scores
+        legs = [
+            ('sell', 'put', puts['short_strike'][put_idx], puts['short_premium'][put_idx]),
+            ('buy', 'put', puts['long_strike'][put_idx], puts['long_premium'][put_idx]),
+            ('sell', 'call', calls['short_strike'][call_idx], calls['short_premium'][call_idx]),
+            ('buy', 'call', calls['long_strike'][call_idx], calls['long_premium'][call_idx]),
+        ]
+        return metrics, legs
+
+    def _condor_metrics(self, puts, calls, put_idx, call_idx, distribution, discount):
+        prob_above, area_above = distribution
+        credit = puts['credit'][put_idx] + calls['credit'][call_idx]
+        width = np.maximum(puts['width'][put_idx], calls['width'][call_idx])
+        lower_breakeven = puts['short_strike'][put_idx] - credit
+        upper_breakeven = calls['short_strike'][call_idx] + credit
+        probability = np.clip(prob_above(lower_breakeven) - prob_above(upper_breakeven), 0.0, 1.0)
+        # Expected payouts of the short put spread and the short call spread at expiry
+        put_width = puts['short_strike'][put_idx] - puts['long_strike'][put_idx]
+        put_loss = put_width - area_above(puts['long_strike'][put_idx], puts['short_strike'][put_idx])
+        call_loss = area_above(calls['short_strike'][call_idx], calls['long_strike'][call_idx])
+        expected_value = (credit - discount * (put_loss + call_loss)) * 100
+        metrics = self._metrics(credit * 100, np.maximum(width - credit, 0.0) * 100, probability, expected_value,
+                                credit)
+        metrics['breakevens'] = np.column_stack([lower_breakeven, upper_breakeven])
+        return metrics
+
+    def _metrics(self, max_profit, max_loss, probability, expected_value, net_premium):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return_on_risk = np.where(max_loss > 0, max_profit / max_loss, np.inf)
+        return {
+            'maxProfit': max_profit,
+            'maxLoss': max_loss,
+            'probabilityOfProfit': probability,
+            'returnOnRisk': return_on_risk,
+            'expectedValue': expected_value,
+            'netPremium': net_premium,
+        }
+
+    def _select(self, metrics, legs, top_k, rank, min_probability):
+        """Keep the top_k rows by rank among those meeting min_probability"""
+        scores = np.where(metrics['probabilityOfProfit'] >= min_probability, metrics[rank], -np.inf)
+        keep = np.argsort(-scores, kind='stable')[:top_k]
+        keep = keep[np.isfinite(scores[keep])]
+        metrics = {name: values[keep] for name, values in metrics.items()}
+        metrics['score'] = scores[keep]
+        legs = [(action, option_type, strikes[keep], premiums[keep]) for action, option_type, strikes, premiums in legs]
+        return metrics, legs
+
+    def _describe(self, template, metrics, legs, row):
+        """One ranked candidate in the STRATEGY_TEMPLATES leg format"""
+        return {
+            'strategy': STRATEGY_TEMPLATES[template]['name'],
+            'legs': [
+                {'action': action, 'type': option_type, 'strike': float(strikes[row]),
+                 'premium': round(float(premiums[row]), 2), 'contracts': 1}
+                for action, option_type, strikes, premiums in legs
+            ],
+            'maxProfit': round(float(metrics['maxProfit'][row]), 2),
+            'maxLoss': round(float(metrics['maxLoss'][row]), 2),
+            'breakevens': [round(float(value), 2) for value in metrics['breakevens'][row]],
+            'netPremium': round(float(metrics['netPremium'][row]), 2),
+            'returnOnRisk': round(float(metrics['returnOnRisk'][row]), 4),
+            'probabilityOfProfit': round(float(metrics['probabilityOfProfit'][row]), 4),
+            'expectedValue': round(float(metrics['expectedValue'][row]), 2),
+        }
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Scenario and stress testing for option books
+Every scenario (spot shift, vol shift, days of decay) is a full Black-Scholes
+revaluation of every position, computed as one scenarios x positions array.
+
+Repeatable risk runs from the command line:
+    python stress_testing.py positions.json scenarios.json
+positions.json: {"positions": [...], "spots": {"AAPL": 190.0}}
+scenarios.json: {"scenarios": [{"name": ..., "spotShift": -0.1, "volShift": 0.05, "days": 1}],
+                 "grid": {"spotShifts": [...], "volShifts": [...], "days": [...]}}
+"""
+
+import itertools
+import json
+import sys
+
+import numpy as np
+
+from options_pricing import OptionsPricingEngine
+
+
+def load_scenario_file(path):
+    """Read a JSON scenario file with 'scenarios' and/or 'grid' entries"""
+    with open(path) as handle:
+        spec = json.load(handle)
+    return spec.get('scenarios', []), spec.get('grid')
+
+
+class StressTestEngine:
+    """Full-revaluation P&L of option positions under named scenarios"""
+
+    def __init__(self, pricing_engine=None, chunk_size=500):
+        self.pricing_engine = pricing_engine or OptionsPricingEngine()
+        self.chunk_size = chunk_size  # Scenarios revalued per array pass
+
+    def build_scenarios(self, scenarios=None, grid=None):
+        """
+        Normalize explicit scenarios and expand a grid into their combinations
+        spotShift is a fraction (-0.1 = spot down 10%), volShift is in vol points
+        as a fraction (0.05 = +5 vol), days is calendar days of time decay.
+        """
+        built = []
+        for index, scenario in enumerate(scenarios or []):
+            built.append({
+                'name': scenario.get('name', f"scenario_{index + 1}"),
+                'spotShift': float(scenario.get('spotShift', 0.0)),
+                'volShift': float(scenario.get('volShift', 0.0)),
+                'days': float(scenario.get('days', 0.0))
+            })
+
+        if grid:
+            combinations = itertools.product(
+                grid.get('spotShifts', [0.0]), grid.get('volShifts', [0.0]), grid.get('days', [0.0])
+            )
+            for spot_shift, vol_shift, days in combinations:
+                built.append({
+                    'name': f"spot{spot_shift:+.1%}/vol{vol_shift * 100:+g}/{days:g}d",
+                    'spotShift': float(spot_shift),
+                    'volShift': float(vol_shift),
+                    'days': float(days)
+                })
+
+        if not built:
+            raise ValueError("No scenarios provided")
+        return built
+
+    def run(self, arrays, spots, scenarios, include_positions=False):
+        """
+        Revalue position_arrays output under every scenario
+        Returns base market value plus per-scenario P&L in total and per underlying.
+        """
+        engine = self.pricing_engine
+        underlyings, index = np.unique(arrays['symbol'], return_inverse=True)
+        spot = np.array([spots[symbol] for symbol in underlyings])[index]
+        shares = arrays['quantity'] * 100
+        strike, tenor, vol, is_call = arrays['strike'], arrays['tenor'], arrays['volatility'], arrays['is_call']
+
+        base_values = engine.black_scholes_price(spot, strike, tenor, engine.risk_free_rate, vol, is_call)
+
+        spot_shifts = np.array([scenario['spotShift'] for scenario in scenarios])
+        vol_shifts = np.array([scenario['volShift'] for scenario in scenarios])
+        decay_years = np.array([scenario['days'] for scenario in scenarios]) / 365.0
+
+        # Positions -> underlying aggregation as a (positions, underlyings) one-hot matrix
+        membership = np.zeros((len(index), len(underlyings)))
+        membership[np.arange(len(index)), index] = 1.0
+
+        position_pnl = np.empty((len(scenarios), len(index)))
+        for start in range(0, len(scenarios), self.chunk_size):
+            block = slice(start, start + self.chunk_size)
+            values = engine.black_scholes_price(
+                spot * (1 + spot_shifts[block, np.newaxis]),
+                strike,
+                np.maximum(tenor - decay_years[block, np.newaxis], 0.0),
+                engine.risk_free_rate,
+                np.maximum(vol + vol_shifts[block, np.newaxis], 0.01),
+                is_call
+            )
+            position_pnl[block] = (values - base_values) * shares
+        underlying_pnl = position_pnl @ membership
+        total_pnl = position_pnl.sum(axis=1)
+
+        results = []
+        for row, scenario in enumerate(scenarios):
+            entry = dict(scenario)
+            entry['pnl'] = round(float(total_pnl[row]), 2)
+            entry['underlyings'] = {str(symbol): round(float(value), 2)
+                                    for symbol, value in zip(underlyings, underlying_pnl[row])}
+            if include_positions:
+                entry['positions'] = position_pnl[row].round(2).tolist()
+            results.append(entry)
+
+        worst = int(np.argmin(total_pnl))
+        best = int(np.argmax(total_pnl))
+        return {
+            'baseValue': round(float((base_values * shares).sum()), 2),
+            'scenarioCount': len(scenarios),
+            'positionCount': len(index),
+            'worstScenario': results[worst]['name'],
+            'worstPnL': results[worst]['pnl'],
+            'bestScenario': results[best]['name'],
+            'bestPnL': results[best]['pnl'],
+            'scenarios': results
+        }
+
+
+def main(argv):
+    if len(argv) != 3:
+        print(__doc__)
+        return 1
+
+    with open(argv[1]) as handle:
+        book = json.load(handle)
+    scenarios, grid = load_scenario_file(argv[2])
+
+    stress_engine = StressTestEngine()
+    engine = stress_engine.pricing_engine
+    arrays = engine.position_arrays(book['positions'], book.get('volatility', 0.25))
+    spots = {symbol.upper(): float(price) for symbol, price in book.get('spots', {}).items()}
+    spots.update(engine.get_quotes(set(arrays['symbol'].tolist()) - set(spots)))
+
+    report = stress_engine.run(arrays, spots, stress_engine.build_scenarios(scenarios, grid))
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
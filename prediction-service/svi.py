@@ -0,0 +1,151 @@
+"""
+Raw SVI smile fits per expiration
+Total implied variance in log-forward-moneyness k = ln(K / F) is modelled as
+    w(k) = a + b * (rho * (k - m) + sqrt((k - m)^2 + sigma^2))
+For fixed (m, sigma) the model is linear in (a, b, b * rho), so every pair on
+an (m, sigma) grid is solved as one batched weighted least-squares problem;
+the best admissible pair is then refined on a finer grid around it.
+"""
+
+import numpy as np
+
+SVI_PARAMS = ('a', 'b', 'rho', 'm', 'sigma')
+MIN_SMILE_POINTS = 5
+
+
+class SVISmile:
+    """Fitted raw SVI parameters for one expiration"""
+
+    def __init__(self, a, b, rho, m, sigma, tenor, forward, rmse=None, points=0):
+        self.a, self.b, self.rho, self.m, self.sigma = (float(value) for value in (a, b, rho, m, sigma))
+        self.tenor = float(tenor)  # Years
+        self.forward = float(forward)
+        self.rmse = rmse  # Vega-weighted IV fit error
+        self.points = points
+
+    def total_variance(self, log_moneyness):
+        shifted = np.asarray(log_moneyness, dtype=float) - self.m
+        return self.a + self.b * (self.rho * shifted + np.sqrt(shifted ** 2 + self.sigma ** 2))
+
+    def implied_vol(self, strikes):
+        """Closed-form smile volatility at any strikes"""
+        variance = self.total_variance(np.log(np.asarray(strikes, dtype=float) / self.forward))
+        return np.sqrt(np.maximum(variance, 0.0) / self.tenor)
+
+    @classmethod
+    def fit(cls, strikes, ivs, tenor, forward, weights=None, grid_size=15, refinements=2):
+        """
+        Fit quoted implied vols of one expiration
+        weights: per-quote weights (e.g. vega) so far-OTM quotes with little
+        price information pull less on the fit. Returns None with fewer than
+        MIN_SMILE_POINTS quotes or no admissible parameters.
+        """
+        strikes, ivs = np.asarray(strikes, dtype=float), np.asarray(ivs, dtype=float)
+        if len(strikes) < MIN_SMILE_POINTS or tenor <= 0:
+            return None
+        weights = np.ones(len(strikes)) if weights is None else np.asarray(weights, dtype=float)
+        weights = weights / weights.sum()
+
+        k = np.log(strikes / forward)
+        w = ivs ** 2 * tenor
+        span = max(k.max() - k.min(), 1e-3)
+
+        m_grid = np.linspace(k.min(), k.max(), grid_size)
+        sigma_grid = np.geomspace(1e-3, 2 * span, grid_size)
+        best = None
+        for _ in range(refinements + 1):
+            candidate = cls._solve_grid(k, w, weights, m_grid, sigma_grid)
+            if candidate is not None and (best is None or candidate[1] < best[1]):
+                best = candidate
+            if best is None:
+                return None
+            # Zoom in around the best pair, one grid step either side
+            (_, _, _, m, sigma), _ = best
+            m_step = m_grid[1] - m_grid[0]
+            sigma_ratio = sigma_grid[1] / sigma_grid[0]
+            m_grid = np.linspace(m - m_step, m + m_step, grid_size)
+            sigma_grid = np.geomspace(sigma / sigma_ratio, sigma * sigma_ratio, grid_size)
+
+        params, _ = best
+        smile = cls(*params, tenor=tenor, forward=forward, points=len(k))
+        residuals = smile.implied_vol(strikes) - ivs
+        smile.rmse = float(np.sqrt(np.sum(weights * residuals ** 2)))
+        return smile
+
+    @staticmethod
+    def _solve_grid(k, w, weights, m_grid, sigma_grid):
+        """Best admissible ((a, b, rho, m, sigma), weighted SSE) over an (m, sigma) grid, or None"""
+        m, sigma = (grid.ravel() for grid in np.meshgrid(m_grid, sigma_grid, indexing='ij'))
+        shifted = k - m[:, np.newaxis]  # (pairs, points)
+        root = np.sqrt(shifted ** 2 + sigma[:, np.newaxis] ** 2)
+
+        # Weighted normal equations for the basis (1, root, shifted), from mat-vec moment sums
+        weighted_w = weights * w
+        sum_r, sum_s = root @ weights, shifted @ weights
+        sum_ss = shifted ** 2 @ weights
+        sum_rs = (root * shifted) @ weights
+        normal = np.empty((len(m), 3, 3))
+        normal[:, 0] = np.column_stack([np.ones(len(m)), sum_r, sum_s])
+        normal[:, 1] = np.column_stack([sum_r, sum_ss + sigma ** 2, sum_rs])
+        normal[:, 2] = np.column_stack([sum_s, sum_rs, sum_ss])
+        rhs = np.column_stack([np.full(len(m), weighted_w.sum()), root @ weighted_w, shifted @ weighted_w])
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            coefficients = np.linalg.solve(normal + 1e-12 * np.eye(3), rhs[..., np.newaxis])[..., 0]
+            a, b, b_rho = coefficients.T
+            rho = b_rho / b
+        # Least-squares residual: y'Wy - c'X'Wy
+        sse = weighted_w @ w - np.sum(coefficients * rhs, axis=1)
+
+        # No negative variance at the smile minimum and a valid correlation
+        admissible = (b > 0) & (np.abs(rho) < 1) & (a + b * sigma * np.sqrt(np.maximum(1 - rho ** 2, 0.0)) >= 0)
+        if not admissible.any():
+            return None
+        best = int(np.argmin(np.where(admissible, sse, np.inf)))
+        return (a[best], b[best], rho[best], m[best], sigma[best]), float(sse[best])
+
+    @staticmethod
+    def chain_quotes(chain, forward):
+        """Converged out-of-the-money quotes of one processed expiration: puts below the forward, calls above"""
+        puts, calls = chain['puts'], chain['calls']
+        put_mask = (puts['strike'] < forward) & puts['ivConverged'] & (puts['vega'] > 0)
+        call_mask = (calls['strike'] >= forward) & calls['ivConverged'] & (calls['vega'] > 0)
+        return {
+            'strike': np.concatenate([puts['strike'][put_mask], calls['strike'][call_mask]]),
+            'impliedVolatility': np.concatenate([puts['impliedVolatility'][put_mask],
+                                                 calls['impliedVolatility'][call_mask]]),
+            'vega': np.concatenate([puts['vega'][put_mask], calls['vega'][call_mask]]),
+            'isCall': np.concatenate([np.zeros(put_mask.sum(), dtype=bool), np.ones(call_mask.sum(), dtype=bool)])
+        }
+
+    @classmethod
+    def from_chain_slice(cls, chain, spot, rate):
+        """Fit one processed expiration, weighting quotes by vega"""
+        tenor = chain['timeToExpiration']
+        if tenor <= 0:
+            return None
+        forward = spot * np.exp(rate * tenor)
+        quotes = cls.chain_quotes(chain, forward)
+        return cls.fit(quotes['strike'], quotes['impliedVolatility'], tenor, forward, weights=quotes['vega'])
+
+    def residuals(self, chain):
+        """Fitted minus market IV for the quotes of a chain slice the smile was fitted to"""
+        quotes = self.chain_quotes(chain, self.forward)
+        fitted = self.implied_vol(quotes['strike'])
+        return {
+            'strike': quotes['strike'],
+            'isCall': quotes['isCall'],
+            'marketIV': quotes['impliedVolatility'],
+            'fittedIV': fitted,
+            'residual': fitted - quotes['impliedVolatility']
+        }
+
+    def to_dict(self):
+        """JSON-friendly parameters"""
+        return {
+            **{name: round(getattr(self, name), 6) for name in SVI_PARAMS},
+            'timeToExpiration': self.tenor,
+            'forward': round(self.forward, 4),
+            'rmse': None if self.rmse is None else round(self.rmse, 6),
+            'points': self.points
+        }
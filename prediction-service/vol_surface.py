@@ -0,0 +1,93 @@
+"""
+Implied volatility surface built from processed options chains
+Vols are held on a log-moneyness x tenor grid and interpolated linearly in
+moneyness and in total variance across tenors.
+"""
+
+import numpy as np
+
+
+class VolSurface:
+    """Implied volatility as a function of strike and time to expiration"""
+
+    def __init__(self, spot, tenors, log_moneyness, vols, expirations=None):
+        self.spot = float(spot)
+        self.tenors = np.asarray(tenors, dtype=float)  # Years, ascending
+        self.log_moneyness = np.asarray(log_moneyness, dtype=float)  # Uniform grid of ln(K / S)
+        self.vols = np.asarray(vols, dtype=float)  # Shape (tenors, moneyness points)
+        self.expirations = list(expirations or [])
+
+    @classmethod
+    def from_chain(cls, options_data, grid_points=41, max_log_moneyness=0.5):
+        """
+        Build a surface from a columnar chain returned by get_options_chain
+        Each expiration contributes its out-of-the-money quotes (puts below
+        spot, calls at or above) whose implied volatility converged.
+        """
+        spot = float(options_data['currentPrice'])
+        grid = np.linspace(-max_log_moneyness, max_log_moneyness, grid_points)
+
+        slices = []
+        for exp_date, chain in options_data['chains'].items():
+            tenor = chain['timeToExpiration']
+            if tenor <= 0:
+                continue
+
+            puts, calls = chain['puts'], chain['calls']
+            put_mask = (puts['strike'] < spot) & puts['ivConverged']
+            call_mask = (calls['strike'] >= spot) & calls['ivConverged']
+            strikes = np.concatenate([puts['strike'][put_mask], calls['strike'][call_mask]])
+            ivs = np.concatenate([puts['impliedVolatility'][put_mask], calls['impliedVolatility'][call_mask]])
+            if len(strikes) < 2:
+                continue
+
+            order = np.argsort(strikes)
+            moneyness = np.log(strikes[order] / spot)
+            # np.interp extrapolates flat beyond the quoted strikes
+            slices.append((tenor, exp_date, np.interp(grid, moneyness, ivs[order])))
+
+        if not slices:
+            raise ValueError(f"Not enough implied volatility data to build a surface for {options_data['symbol']}")
+
+        slices.sort(key=lambda item: item[0])
+        tenors, expirations, vols = zip(*slices)
+        return cls(spot, tenors, grid, np.vstack(vols), expirations)
+
+    def implied_vol(self, strikes, tenors):
+        """
+        Interpolate volatility at (strike, tenor) points; inputs broadcast together
+        Moneyness outside the grid and tenors outside the quoted range are held flat.
+        """
+        strikes, tenors = np.broadcast_arrays(np.asarray(strikes, dtype=float), np.asarray(tenors, dtype=float))
+
+        # Linear interpolation along the uniform moneyness grid
+        grid = self.log_moneyness
+        step = grid[1] - grid[0]
+        position = (np.clip(np.log(strikes / self.spot), grid[0], grid[-1]) - grid[0]) / step
+        lower = np.clip(np.floor(position).astype(int), 0, len(grid) - 2)
+        weight = position - lower
+        slice_vols = self.vols[:, lower] * (1 - weight) + self.vols[:, lower + 1] * weight
+
+        if len(self.tenors) == 1:
+            return slice_vols[0]
+
+        # Linear interpolation in total variance between the bracketing expirations
+        clipped = np.clip(tenors, self.tenors[0], self.tenors[-1])
+        upper = np.clip(np.searchsorted(self.tenors, clipped), 1, len(self.tenors) - 1)
+        t0, t1 = self.tenors[upper - 1], self.tenors[upper]
+        v0 = np.take_along_axis(slice_vols, (upper - 1)[np.newaxis], axis=0)[0]
+        v1 = np.take_along_axis(slice_vols, upper[np.newaxis], axis=0)[0]
+        fraction = (clipped - t0) / (t1 - t0)
+        total_variance = v0 ** 2 * t0 + (v1 ** 2 * t1 - v0 ** 2 * t0) * fraction
+        return np.sqrt(np.maximum(total_variance, 0.0) / clipped)
+
+    def to_dict(self):
+        """JSON-friendly grid representation"""
+        return {
+            'spot': self.spot,
+            'expirations': self.expirations,
+            'tenors': self.tenors.tolist(),
+            'logMoneyness': self.log_moneyness.round(4).tolist(),
+            'strikes': (self.spot * np.exp(self.log_moneyness)).round(2).tolist(),
+            'vols': self.vols.round(4).tolist()
+        }
@@ -10,6 +10,19 @@ import { useAuth } from './AuthContext'
 
 const PREDICTION_API_URL = 'http://localhost:5000'
 
+// The chain is fetched in the compact columnar format (one array per field)
+// and expanded back into one object per contract for the chain components
+const expandColumnarChains = (data) => {
+  const toContracts = (columns) => (columns[data.fields[0]] || []).map((_, index) =>
+    Object.fromEntries(data.fields.map(field => [field, columns[field][index]]))
+  )
+  const chains = {}
+  Object.entries(data.chains).forEach(([expiration, chain]) => {
+    chains[expiration] = { ...chain, calls: toContracts(chain.calls), puts: toContracts(chain.puts) }
+  })
+  return { ...data, chains }
+}
+
 export default function OptionsPage() {
   const { symbol: paramSymbol } = useParams()
   const [searchParams, setSearchParams] = useSearchParams()
@@ -41,7 +54,9 @@ export default function OptionsPage() {
         
         console.log(`Fetching options data for ${symbol}...`) // Debug log
         
-        const response = await fetch(`${PREDICTION_API_URL}/options-chain/${symbol}`)
+        // Chains are loaded per expiration; without one the service returns the nearest
+        const expirationParam = selectedExpiration ? `&expiration=${selectedExpiration}` : ''
+        const response = await fetch(`${PREDICTION_API_URL}/options-chain/${symbol}?format=columnar&precision=4${expirationParam}`)
         
         if (!response.ok) {
           throw new Error(`HTTP error! status: ${response.status}`)
@@ -53,7 +68,11 @@ export default function OptionsPage() {
         
         // Check if the response has the expected structure
         if (result && result.data && result.data.chains) {
-          setOptionsData(result.data)
+          const data = result.data.format === 'columnar' ? expandColumnarChains(result.data) : result.data
+          // Keep chains already loaded for other expirations of the same symbol
+          setOptionsData(previous => previous && previous.symbol === data.symbol
+            ? { ...data, chains: { ...previous.chains, ...data.chains } }
+            : data)
           
           // Set default expiration if not already set
           if (!selectedExpiration && result.data.expirationDates && result.data.expirationDates.length > 0) {
@@ -89,7 +108,7 @@ export default function OptionsPage() {
     return () => {
       if (interval) clearInterval(interval)
     }
-  }, [symbol, autoRefreshEnabled])
+  }, [symbol, selectedExpiration, autoRefreshEnabled])
 
   // Handle symbol change
   const handleSymbolChange = (newSymbol) => {